@@ -0,0 +1,166 @@
+"""ASGI-приложение поверх обработчика WSGI.
+
+Django 2.2 не умеет асинхронные представления, поэтому все они остаются
+синхронными и выполняются в пуле потоков, а цикл событий тем временем принимает
+запросы и отдаёт ответы остальным клиентам. Один процесс обслуживает
+одновременно до ASGI_THREADS запросов, а медленный клиент занимает
+только сопрограмму, а не поток с соединением к базе.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+
+class ASGIHandler:
+    def __init__(self, wsgi_application=None, threads=None):
+        self.wsgi_application = wsgi_application or WSGIHandler()
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            raise ValueError(
+                f'Неподдерживаемый тип соединения: {scope["type"]}'
+            )
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    def max_body_size():
+        """Наибольшее тело запроса: картинка поста и остальные поля формы."""
+        return (
+            settings.POST_IMAGE_MAX_BYTES
+            + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        )
+
+    async def http(self, scope, receive, send):
+        limit = self.max_body_size()
+        length = dict(scope.get('headers', [])).get(b'content-length', b'')
+        if length.isdigit() and int(length) > limit:
+            await self.too_large(send)
+            return
+        # Тело запроса дочитывается в цикле событий: поток пула
+        # не простаивает, пока клиент медленно загружает картинку.
+        # Content-Length может не быть или он может врать, поэтому
+        # прочитанное тоже сверяется с лимитом
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        received = 0
+        with body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                chunk = message.get('body', b'')
+                received += len(chunk)
+                if received > limit:
+                    await self.too_large(send)
+                    return
+                body.write(chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            status, headers, chunks = await loop.run_in_executor(
+                self.executor, self.run, self.environ(scope, body)
+            )
+        await self.respond(send, status, headers, b''.join(chunks))
+
+    async def too_large(self, send):
+        await self.respond(
+            send, 413, [('Content-Type', 'text/plain; charset=utf-8')],
+            'Слишком большой запрос'.encode(),
+        )
+
+    @staticmethod
+    async def respond(send, status, headers, body):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (name.lower().encode('latin1'), value.encode('latin1'))
+                for name, value in headers
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    def environ(scope, body):
+        """Окружение WSGI для запроса из области ASGI."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        # В ASGI path содержит и root_path, а в WSGI префикс приложения
+        # есть только в SCRIPT_NAME
+        script_name = scope.get('root_path', '')
+        path_info = scope['path']
+        if script_name and path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name.encode().decode('latin1'),
+            'PATH_INFO': path_info.encode().decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name, value = name.decode('latin1'), value.decode('latin1')
+            if name == 'content-type':
+                key = 'CONTENT_TYPE'
+            elif name == 'content-length':
+                key = 'CONTENT_LENGTH'
+            else:
+                key = 'HTTP_' + name.upper().replace('-', '_')
+            if key in environ:
+                value = f'{environ[key]},{value}'
+            environ[key] = value
+        return environ
+
+    def run(self, environ):
+        """Выполняет запрос в потоке пула и собирает ответ целиком.
+
+        Ответ закрывается в том же потоке: сигнал request_finished
+        закрывает соединения с базой, открытые этим потоком.
+        """
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = headers
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            chunks = list(response)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return started['status'], started['headers'], chunks
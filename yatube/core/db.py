@@ -0,0 +1,79 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_state = threading.local()
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS на каждом новом соединении с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Разрешает читать с реплик до первой записи внутри блока.
+
+    Возвращает функцию, которая сообщает, была ли в блоке запись.
+    """
+    _state.replica_reads = enabled
+    _state.written = False
+    try:
+        yield lambda: _state.written
+    finally:
+        _state.replica_reads = False
+        _state.written = False
+
+
+def reading_replicas():
+    """Читает ли текущий запрос реплики, которые могут отставать."""
+    return bool(
+        settings.DB_REPLICAS and getattr(_state, 'replica_reads', False)
+    )
+
+
+def is_cache_table(model):
+    # Модель таблицы DatabaseCache (CACHE_BACKEND=db)
+    return model._meta.app_label == 'django_cache'
+
+
+class ReplicaRouter:
+    """Чтение — с реплик из DB_REPLICAS, запись — в основную базу.
+
+    Реплики используются только внутри ``replica_reads()``: всё, что
+    выполняется вне запроса (команды, миграции), читает основную базу.
+    После первой записи чтение до конца блока тоже идёт в основную базу,
+    чтобы запрос видел собственные изменения.
+
+    Таблица кэша всегда живёт в основной базе: её записи — не изменения
+    данных и не привязывают клиента к основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_cache_table(model):
+            return 'default'
+        if reading_replicas():
+            return random.choice(settings.DB_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if is_cache_table(model):
+            return 'default'
+        _state.replica_reads = False
+        _state.written = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,156 @@
+"""Гистограммы запросов по представлениям в текстовом формате Prometheus.
+
+Значения хранятся в памяти процесса: каждый воркер отдаёт на /metrics
+свои, а Prometheus складывает их по меткам instance.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.template.backends import django
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self.lock:
+            counts = self.series.get(view)
+            if counts is None:
+                # Корзины, корзина +Inf, число наблюдений и их сумма
+                counts = self.series[view] = [0] * (len(self.buckets) + 3)
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self.lock:
+            series = {
+                view: list(counts) for view, counts in self.series.items()
+            }
+        for view, counts in sorted(series.items()):
+            label = view.replace('\\', '\\\\').replace('"', '\\"')
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                lines.append(
+                    f'{self.name}_bucket{{view="{label}",le="{bound}"}} '
+                    f'{total}'
+                )
+            lines.append(f'{self.name}_count{{view="{label}"}} {counts[-2]}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {counts[-1]}')
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    'yatube_request_duration_seconds',
+    'Время обработки запроса', SECONDS,
+)
+DB_QUERIES = Histogram(
+    'yatube_db_queries',
+    'Число SQL-запросов за запрос', QUERIES,
+)
+DB_DURATION = Histogram(
+    'yatube_db_duration_seconds',
+    'Время SQL-запросов за запрос', SECONDS,
+)
+TEMPLATE_DURATION = Histogram(
+    'yatube_template_duration_seconds',
+    'Время отрисовки шаблонов за запрос', SECONDS,
+)
+HISTOGRAMS = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, TEMPLATE_DURATION)
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        with histogram.lock:
+            histogram.series.clear()
+
+
+class Sample:
+    """Счётчики одного замеряемого запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+_local = threading.local()
+
+
+def current():
+    """Замер текущего запроса в этом потоке или None."""
+    return getattr(_local, 'sample', None)
+
+
+def start():
+    _local.sample = Sample()
+    return _local.sample
+
+
+def stop():
+    _local.sample = None
+
+
+class TimedTemplate(django.Template):
+    """Шаблон, время отрисовки которого попадает в замер запроса."""
+
+    def render(self, context=None, request=None):
+        sample = current()
+        if sample is None:
+            return super().render(context, request)
+        # Вложенные render_to_string уже входят во время внешнего шаблона
+        sample.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template_depth -= 1
+            if not sample.template_depth:
+                sample.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """Движок DjangoTemplates, который отдаёт замеряемые шаблоны.
+
+    Подключается в TEMPLATES['BACKEND']. Вне замеряемых запросов
+    обёртка стоит одну проверку thread-local.
+    """
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return TimedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,73 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .db import replica_reads
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'db_primary'
+
+
+class PrimaryDatabaseMiddleware:
+    """Направляет чтение безопасных запросов на реплики.
+
+    После запроса, который что-то записал, клиент получает cookie, и на
+    DB_STICKY_SECONDS все его запросы читают основную базу: страница
+    после редиректа с формы видит только что созданный пост, даже если
+    реплика ещё отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas = (
+            request.method in SAFE_METHODS
+            and STICKY_COOKIE not in request.COOKIES
+        )
+        with replica_reads(use_replicas) as written:
+            response = self.get_response(request)
+            if written():
+                response.set_cookie(
+                    STICKY_COOKIE, '1',
+                    max_age=settings.DB_STICKY_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        return response
+
+
+class MetricsMiddleware:
+    """Замеряет время, SQL-запросы и отрисовку шаблонов по представлениям.
+
+    Замеряется доля METRICS_SAMPLE_RATE запросов; при нуле middleware
+    только передаёт запрос дальше. Гистограммы отдаёт /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.METRICS_SAMPLE_RATE
+        if not rate or rate < 1 and random.random() >= rate:
+            return self.get_response(request)
+        sample = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.REQUEST_DURATION.observe(view, time.perf_counter() - started)
+        metrics.DB_QUERIES.observe(view, sample.queries)
+        metrics.DB_DURATION.observe(view, sample.db_time)
+        metrics.TEMPLATE_DURATION.observe(view, sample.template_time)
+        return response
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
 
 
 def page_not_found(request, exception):
@@ -9,3 +14,19 @@ def csrf_failure(request, reason=''):
     return render(
         request, 'core/403csrf.html', {'path': request.path}, status=403
     )
+
+
+def metrics(request):
+    """Гистограммы MetricsMiddleware в текстовом формате Prometheus.
+
+    Доступны только по METRICS_TOKEN: пока он не задан, /metrics закрыт.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        request_metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,181 @@
+"""Поколения кэша лент.
+
+Ключ кэшированного фрагмента или страницы и её ETag включают номера
+поколений своих областей (``index``, ``group:<slug>``,
+``profile:<username>``, ``post:<id>``, ``author:<id>``, ``follows:<id>``).
+Любое изменение поста увеличивает номера затронутых областей, и
+следующий запрос обращается к новому ключу, а старые записи просто
+истекают по таймауту.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.middleware.csrf import get_token
+from django.utils.cache import (get_conditional_response,
+                                patch_vary_headers, set_response_etag)
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import condition
+
+from core.db import reading_replicas
+
+
+def _key(scope):
+    return f'feed-generation:{scope}'
+
+
+def _fresh_generation():
+    # После вытеснения счётчика из кэша нельзя начинать с единицы:
+    # старые фрагменты с такими номерами ещё могут быть живы.
+    return int(time.time() * 1000)
+
+
+def _lag_key(scope):
+    return f'feed-lag:{scope}'
+
+
+def _stored(scope):
+    value = cache.get(_key(scope))
+    if value is None:
+        cache.add(
+            _key(scope), _fresh_generation(), settings.GENERATION_TIMEOUT
+        )
+        value = cache.get(_key(scope))
+    return value
+
+
+def generation(scope):
+    """Текущий номер поколения области кэша."""
+    return generations(scope)[0]
+
+
+def generations(*scopes):
+    """Номера поколений нескольких областей за одно обращение к кэшу.
+
+    Первые DB_STICKY_SECONDS после сдвига реплика может ещё не видеть
+    изменения. Запрос, читающий реплику, получает в это время отдельный
+    номер, и закэшированное по старым строкам не достанется тем, кто
+    придёт после окна: для них это всё равно что повторный сдвиг.
+    """
+    keys = [_key(scope) for scope in scopes]
+    lagging = reading_replicas()
+    if lagging:
+        keys += [_lag_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    values = [found.get(_key(scope)) or _stored(scope) for scope in scopes]
+    if lagging:
+        values = [
+            f'{value}r' if _lag_key(scope) in found else value
+            for scope, value in zip(scopes, values)
+        ]
+    return values
+
+
+def bump(*scopes):
+    """Делает устаревшими все фрагменты перечисленных областей."""
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.add(
+                _key(scope), _fresh_generation(),
+                settings.GENERATION_TIMEOUT,
+            )
+    if settings.DB_REPLICAS:
+        cache.set_many(
+            {_lag_key(scope): True for scope in scopes},
+            settings.DB_STICKY_SECONDS,
+        )
+
+
+def bump_on_write(*scopes):
+    """``bump`` для изменения в транзакции: сразу и после фиксации.
+
+    Запрос, пришедший между первым сдвигом и фиксацией, читает старые
+    строки и сохраняет их под новым номером; второй сдвиг после фиксации
+    делает такие записи и их ETag недостижимыми.
+    """
+    bump(*scopes)
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def _resolve(scopes, request, kwargs):
+    """Имена областей: шаблоны заполняются аргументами представления,
+    функции вызываются с запросом и этими аргументами."""
+    return [
+        scope(request, **kwargs) if callable(scope)
+        else scope.format(**kwargs)
+        for scope in scopes
+    ]
+
+
+def page_etag(request, scopes, csrf=False):
+    """ETag страницы по поколениям её областей, без запросов к ленте.
+
+    ``csrf`` — на странице есть форма: в ETag входит cookie CSRF, чтобы
+    после её смены браузер не отправлял форму из старой копии.
+    """
+    token = '{}:{}:{}'.format(
+        request.get_full_path(),
+        request.user.pk,
+        '.'.join(map(str, generations(*scopes))),
+    )
+    if csrf:
+        # Без cookie токен создаётся сейчас и уходит с этим же ответом
+        get_token(request)
+        token += ':' + request.META['CSRF_COOKIE']
+    return '"{}"'.format(hashlib.md5(token.encode()).hexdigest())
+
+
+def conditional_page(*scopes, csrf=False):
+    """Отвечает 304, не вызывая представление, пока поколения
+    областей страницы не изменились."""
+    def etag_func(request, *args, **kwargs):
+        return page_etag(request, _resolve(scopes, request, kwargs), csrf)
+    return condition(etag_func=etag_func)
+
+
+def cache_anonymous_page(*scopes):
+    """Кэширует страницу целиком для анонимных посетителей.
+
+    Области задаются так же, как для ``conditional_page``, например
+    ``'group:{slug}'``. Повторный запрос
+    с совпадающим ETag или Last-Modified получает 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            names = _resolve(scopes, request, kwargs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = 'page:{}:{}'.format(
+                path, '.'.join(map(str, generations(*names)))
+            )
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.cookies:
+                    return response
+                if not response.has_header('ETag'):
+                    set_response_etag(response)
+                response['Last-Modified'] = http_date()
+                patch_vary_headers(response, ('Cookie',))
+                cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+                return response
+            return get_conditional_response(
+                request,
+                etag=response['ETag'],
+                last_modified=parse_http_date_safe(
+                    response['Last-Modified']
+                ),
+                response=response,
+            )
+        return wrapper
+    return decorator
@@ -0,0 +1,86 @@
+"""Общее число постов ленты для пагинатора без COUNT(*) на каждый запрос.
+
+Главная лента берёт счётчик из кэша, который сигналы сдвигают при
+добавлении и удалении постов. Лента подписок считается один раз на
+поколение своих областей кэша. Если счётчика нет, а таблица по
+статистике базы огромна, вместо точного подсчёта берётся оценка.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from . import cache as feed_cache
+
+INDEX_KEY = 'feed-count:index'
+
+
+def estimated_count(queryset):
+    """Число строк таблицы по статистике планировщика или None."""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Ветка не проверена тестами: они идут на SQLite
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [table],
+            )
+            row = cursor.fetchone()
+            # -1 означает, что ANALYZE по таблице ещё не выполнялся
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table],
+            )
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+def exact_or_estimated(queryset):
+    """Точный подсчёт, а для огромной таблицы — оценка по статистике."""
+    estimate = estimated_count(queryset)
+    if estimate is not None and estimate >= settings.FEED_COUNT_ESTIMATE_FROM:
+        return estimate
+    return queryset.count()
+
+
+def maintained_count(key, queryset):
+    """Счётчик в кэше; после вытеснения он считается заново."""
+    count = cache.get(key)
+    if count is None:
+        cache.add(key, exact_or_estimated(queryset),
+                  settings.FEED_CACHE_TIMEOUT)
+        count = cache.get(key)
+    return count
+
+
+def shift(key, delta):
+    """Сдвигает счётчик; если его нет, посчитает следующий запрос."""
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def index_count(queryset):
+    return maintained_count(INDEX_KEY, queryset)
+
+
+def generation_count(queryset, *scopes):
+    """Подсчёт, закэшированный до смены поколения областей ленты."""
+    key = 'feed-count:{}:{}'.format(
+        ','.join(scopes),
+        '.'.join(map(str, feed_cache.generations(*scopes))),
+    )
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.FEED_CACHE_TIMEOUT)
+    return count
@@ -1,6 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 
 from .models import Post, Comment
+from .uploads import OversizedUploadedFile
 
 
 class PostForm(forms.ModelForm):
@@ -19,6 +22,39 @@ class PostForm(forms.ModelForm):
             raise forms.ValidationError("Напишите что-нибудь")
         return text
 
+    def clean_image(self):
+        # Поле уже прочитало только заголовок картинки, декодирования
+        # пикселей ещё не было
+        image = self.cleaned_data["image"]
+        size = getattr(getattr(image, "image", None), "size", (0, 0))
+        if size[0] * size[1] > settings.POST_IMAGE_MAX_PIXELS:
+            raise forms.ValidationError(
+                "Картинка %(width)s×%(height)s слишком большая, допустимо "
+                "не больше %(limit)s мегапикселей",
+                params={
+                    "width": size[0],
+                    "height": size[1],
+                    "limit": settings.POST_IMAGE_MAX_PIXELS // 10 ** 6,
+                },
+            )
+        return image
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if isinstance(
+            self.files.get(self.add_prefix("image")), OversizedUploadedFile
+        ):
+            # Поле видит лишь пустой обрывок файла и считает его
+            # неправильным изображением; причина на самом деле в размере
+            self.errors.pop("image", None)
+            self.add_error("image", forms.ValidationError(
+                "Файл больше %(limit)s",
+                params={
+                    "limit": filesizeformat(settings.POST_IMAGE_MAX_BYTES),
+                },
+            ))
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,194 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core.asgi import ASGIHandler
+from posts.models import Group, Post
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест страниц чтения: синхронные воркеры WSGI против '
+        'одного процесса ASGI. Запросы выполняются внутри процесса, без '
+        'разбора HTTP, так что сравнивается только модель исполнения'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число синхронных воркеров WSGI',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=settings.ASGI_THREADS,
+            help='Размер пула потоков процесса ASGI',
+        )
+        parser.add_argument(
+            '--io-wait', type=float, default=0,
+            help='Добавить к каждому запросу ожидание, мс',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Запросы без сессии, их отдаёт кэш страниц',
+        )
+
+    def paths(self):
+        posts = list(
+            Post.objects.select_related('author').order_by('-pub_date')[:50]
+        )
+        if not posts:
+            raise CommandError(
+                'База пуста, сначала выполните manage.py seed_posts'
+            )
+        index = reverse('posts:index')
+        paths = [(index, f'page={number}') for number in range(1, 11)]
+        paths += [
+            (reverse('posts:group_list', args=[slug]), '')
+            for slug in Group.objects.values_list('slug', flat=True)[:20]
+        ]
+        for post in posts:
+            paths.append((reverse('posts:post_detail', args=[post.pk]), ''))
+            paths.append(
+                (reverse('posts:profile', args=[post.author.username]), '')
+            )
+        return paths
+
+    def scopes(self, options):
+        headers = [(b'host', b'localhost')]
+        if not options['anonymous']:
+            client = Client()
+            client.force_login(Post.objects.first().author)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            headers.append((
+                b'cookie',
+                f'{settings.SESSION_COOKIE_NAME}={session}'.encode(),
+            ))
+        paths = self.paths()
+        return [
+            {
+                'type': 'http',
+                'method': 'GET',
+                'path': path,
+                'query_string': query.encode(),
+                'headers': headers,
+            }
+            for path, query in (
+                paths[number % len(paths)]
+                for number in range(options['requests'])
+            )
+        ]
+
+    def handler(self, threads, options):
+        handler = ASGIHandler(threads=threads)
+        application = handler.wsgi_application
+        delay = options['io_wait'] / 1000
+
+        def waiting(environ, start_response):
+            # Имитация ожидания внешних систем: поток занят, но не считает
+            time.sleep(delay)
+            return application(environ, start_response)
+
+        if delay:
+            handler.wsgi_application = waiting
+        return handler
+
+    def run_wsgi(self, scopes, options):
+        """Клиенты ждут в общей очереди, воркер ведёт один запрос."""
+        handler = self.handler(1, options)
+        pending = iter(scopes)
+        lock = threading.Lock()
+        latencies, errors = [], []
+
+        def client(workers):
+            while True:
+                with lock:
+                    scope = next(pending, None)
+                if scope is None:
+                    return
+                started = time.perf_counter()
+                status, _, _ = workers.submit(
+                    handler.run, handler.environ(scope, io.BytesIO())
+                ).result()
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors.append(status)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as workers:
+            threads = [
+                threading.Thread(target=client, args=(workers,))
+                for _ in range(options['concurrency'])
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return latencies, errors
+
+    def run_asgi(self, scopes, options):
+        """Все клиенты обслуживаются одним циклом событий."""
+        handler = self.handler(options['threads'], options)
+        latencies, errors = [], []
+
+        async def request(scope):
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                sent.append(message)
+
+            await handler(scope, receive, send)
+            return sent[0]['status']
+
+        async def client(pending):
+            for scope in pending:
+                started = time.perf_counter()
+                status = await request(scope)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    errors.append(status)
+
+        async def main():
+            pending = iter(scopes)
+            await asyncio.gather(*(
+                client(pending) for _ in range(options['concurrency'])
+            ))
+
+        try:
+            asyncio.run(main())
+        finally:
+            handler.executor.shutdown()
+        return latencies, errors
+
+    def handle(self, *args, **options):
+        scopes = self.scopes(options)
+        modes = (
+            (f'WSGI, воркеров: {options["workers"]}', self.run_wsgi),
+            (f'ASGI, потоков: {options["threads"]}', self.run_asgi),
+        )
+        for title, run in modes:
+            cache.clear()
+            started = time.perf_counter()
+            latencies, errors = run(scopes, options)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{title}: {len(latencies) / elapsed:.0f} запросов/с, '
+                f'p50 {percentile(latencies, 0.5) * 1000:.1f} мс, '
+                f'p99 {percentile(latencies, 0.99) * 1000:.1f} мс, '
+                f'ошибок {len(errors)}'
+            )
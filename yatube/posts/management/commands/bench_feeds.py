@@ -0,0 +1,109 @@
+import statistics
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+PER_PAGE = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает план выполнения и время запросов лент '
+        'с индексами и без них'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def feed_queries(self):
+        """Запросы в том виде, в каком их выполняют представления."""
+        post = Post.objects.order_by('-pub_date').first()
+        group = Group.objects.filter(posts__isnull=False).first()
+        follow = Follow.objects.first()
+        if not (post and group and follow):
+            raise CommandError(
+                'База пуста, сначала выполните manage.py seed_posts'
+            )
+        author = post.author
+        reader = User.objects.get(pk=follow.user_id)
+        middle = Post.objects.count() // 2
+        return {
+            'index': Post.objects.feed()[:PER_PAGE],
+            'index, середина': Post.objects.feed()[
+                middle:middle + PER_PAGE
+            ],
+            'group_posts': group.posts.feed()[:PER_PAGE],
+            'profile': author.posts.feed()[:PER_PAGE],
+            'post_detail, комментарии': Comment.objects.filter(
+                post=post
+            ).order_by('created'),
+            'profile, подписка': Follow.objects.filter(
+                user=reader, author=author
+            ),
+            'follow_index': timeline.feed_for(reader)[:PER_PAGE],
+        }
+
+    def explain(self, queryset, title):
+        sql, params = queryset.query.get_compiler(
+            using=queryset.db
+        ).as_sql()
+        prefix = (
+            'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+            else 'EXPLAIN '
+        )
+        with connection.cursor() as cursor:
+            # Комментарий не даёт sqlite3 взять план из кэша выражений,
+            # составленный до удаления индексов.
+            cursor.execute(f'{prefix}{sql} /* {title} */', params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+    def measure(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in self.feed_queries().items():
+            plan = self.explain(queryset, title)
+            table_scan = any(
+                line.startswith('SCAN') and 'INDEX' not in line
+                or 'Seq Scan' in line
+                for line in plan
+            )
+            self.stdout.write(
+                f'{name}: {self.measure(queryset, repeat):.2f} мс'
+                + (self.style.WARNING('  полный просмотр таблицы')
+                   if table_scan else '')
+            )
+            for line in plan:
+                self.stdout.write(f'    {line}')
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        self.report('С индексами', repeat)
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for model in apps.get_app_config('posts').get_models():
+                        for index in model._meta.indexes:
+                            cursor.execute(
+                                'DROP INDEX '
+                                + connection.ops.quote_name(index.name)
+                            )
+                self.report('Без индексов', repeat)
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Считает объём картинок страницы ленты: одна миниатюра 960x339 '
+        'против вариантов srcset, которые выберет браузер'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--viewport', type=int, nargs='+', default=[360, 768, 1280],
+            help='Ширины окна браузера в CSS-пикселях',
+        )
+        parser.add_argument('--dpr', type=float, default=2)
+
+    def chosen(self, picture, viewport, dpr):
+        """Вариант, который браузер возьмёт из первого формата <picture>."""
+        needed = min(viewport, settings.POST_IMAGE_SIZE[0]) * dpr
+        _, files = picture.formats[0]
+        return next(
+            (thumbnail for size, thumbnail in files if size >= needed),
+            files[-1][1],
+        )
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.feed().exclude(
+            image=''
+        )[:settings.AMOUNT_POSTS_NUMBER])
+        if not posts:
+            raise CommandError('В ленте нет постов с картинками')
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        thumbnails.with_thumbnails(posts)
+
+        # Прежняя разметка отдавала одну JPEG-миниатюру основного размера
+        width, height = settings.POST_IMAGE_SIZE
+        legacy = thumbnails.resolve(
+            [post.image for post in posts],
+            [(f'{width}x{height}', {'crop': 'center', 'upscale': True})],
+        )
+        before = sum(thumbnail.storage.size(thumbnail.name)
+                     for thumbnail in legacy.values())
+        original = sum(post.image.size for post in posts)
+        self.stdout.write(f'Постов с картинками на странице: {len(posts)}')
+        self.stdout.write(f'Оригиналы: {original} байт')
+        self.stdout.write(f'Одна миниатюра {width}x{height}: {before} байт')
+        for viewport in options['viewport']:
+            after = sum(
+                thumbnail.storage.size(thumbnail.name)
+                for thumbnail in (
+                    self.chosen(post.picture, viewport, options['dpr'])
+                    for post in posts
+                )
+            )
+            self.stdout.write(
+                f'<picture>, окно {viewport}px x{options["dpr"]:g}: '
+                f'{after} байт ({after / before:.0%})'
+            )
@@ -0,0 +1,66 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.loader import get_template
+
+# Прежний вывод includes/paginator.html: ссылка на каждую страницу
+FULL_RANGE = '''
+{% for i in page_obj.paginator.page_range %}
+  {% if page_obj.number == i %}
+    <li class="page-item active">
+      <span class="page-link">{{ i }}</span>
+    </li>
+  {% else %}
+    <li class="page-item">
+      <a class="page-link" href="?{{ page_prefix }}page={{ i }}">{{ i }}</a>
+    </li>
+  {% endif %}
+{% endfor %}
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает размер и время отрисовки пагинатора ленты: все номера '
+        'страниц против окна вокруг текущей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10 ** 6)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, template, page_obj, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            html = template.render({'page_obj': page_obj})
+            timings.append(time.perf_counter() - started)
+        return len(html.encode()), statistics.median(timings)
+
+    def handle(self, *args, **options):
+        # Пагинатору нужны только длина и срезы, поэтому вместо
+        # миллиона постов хватает range
+        paginator = Paginator(
+            range(options['posts']), settings.AMOUNT_POSTS_NUMBER
+        )
+        templates = (
+            ('Все страницы', engines['django'].from_string(FULL_RANGE)),
+            ('Окно', get_template('includes/paginator.html')),
+        )
+        for number in (1, paginator.num_pages // 2, paginator.num_pages):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'Страница {number} из {paginator.num_pages}'
+            ))
+            page_obj = paginator.page(number)
+            for title, template in templates:
+                size, seconds = self.measure(
+                    template, page_obj, options['repeat']
+                )
+                self.stdout.write(
+                    f'  {title}: {size / 1024:.1f} КБ, '
+                    f'{seconds * 1000:.2f} мс'
+                )
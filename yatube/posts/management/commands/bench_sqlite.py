@@ -0,0 +1,110 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from posts.models import Comment, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пропускную способность чтения ленты при параллельной '
+        'записи комментариев: SQLite по умолчанию против SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+
+    def worker(self, action, deadline, stats):
+        done = errors = 0
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    action()
+                    done += 1
+                except OperationalError:
+                    errors += 1
+        finally:
+            connection.close()
+        with self.lock:
+            stats[0] += done
+            stats[1] += errors
+
+    def run(self, options, post_ids, user_ids):
+        def read():
+            list(Post.objects.feed()[:settings.AMOUNT_POSTS_NUMBER])
+
+        def write():
+            Comment.objects.create(
+                post_id=random.choice(post_ids),
+                author_id=random.choice(user_ids),
+                text='Комментарий из бенчмарка',
+            )
+
+        reads, writes = [0, 0], [0, 0]
+        deadline = time.monotonic() + options['seconds']
+        threads = [
+            threading.Thread(
+                target=self.worker, args=(read, deadline, reads)
+            )
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(
+                target=self.worker, args=(write, deadline, writes)
+            )
+            for _ in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = options['seconds']
+        return (
+            f'чтений {reads[0] / seconds:.0f}/с, '
+            f'записей {writes[0] / seconds:.0f}/с, '
+            f'ошибок блокировки {reads[1] + writes[1]}'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Бенчмарк рассчитан на SQLite')
+        post_ids = list(Post.objects.values_list('pk', flat=True)[:1000])
+        user_ids = list(User.objects.values_list('pk', flat=True)[:1000])
+        if not post_ids:
+            raise CommandError(
+                'База пуста, сначала выполните manage.py seed_posts'
+            )
+        self.lock = threading.Lock()
+        database = settings.DATABASES['default']
+        source = database['NAME']
+        tuned = settings.SQLITE_PRAGMAS
+        modes = (
+            ('По умолчанию', {'journal_mode': 'delete'}),
+            ('SQLITE_PRAGMAS', tuned),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        connections.close_all()
+        with tempfile.TemporaryDirectory() as directory:
+            for number, (title, pragmas) in enumerate(modes):
+                # Каждый режим пишет в свою копию базы: журнал WAL
+                # сохраняется в файле и повлиял бы на следующий прогон
+                copy = os.path.join(directory, f'{number}.sqlite3')
+                shutil.copyfile(source, copy)
+                database['NAME'] = copy
+                settings.SQLITE_PRAGMAS = pragmas
+                try:
+                    result = self.run(options, post_ids, user_ids)
+                finally:
+                    connections.close_all()
+                    database['NAME'] = source
+                    settings.SQLITE_PRAGMAS = tuned
+                self.stdout.write(f'{title}: {result}')
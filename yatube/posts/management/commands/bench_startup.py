@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном интерпретаторе, чтобы импорт шёл с нуля
+MEASURE = '''
+import json, statistics, sys, time
+
+started = time.perf_counter()
+import django
+from django.conf import settings
+if sys.argv[1] == 'toolbar':
+    settings.INSTALLED_APPS = settings.INSTALLED_APPS + ['debug_toolbar']
+    settings.MIDDLEWARE = settings.MIDDLEWARE + [
+        'debug_toolbar.middleware.DebugToolbarMiddleware'
+    ]
+django.setup(set_prefix=False)
+from django.core.handlers.wsgi import WSGIHandler
+handler = WSGIHandler()
+from django.urls import reverse
+reverse('posts:index')
+startup = time.perf_counter() - started
+modules = len(sys.modules)
+
+from django.test import RequestFactory
+request = RequestFactory().get(reverse('about:author'))
+timings = []
+for _ in range(int(sys.argv[2])):
+    started = time.perf_counter()
+    handler.get_response(request)
+    timings.append(time.perf_counter() - started)
+print(json.dumps({
+    'startup': startup,
+    'modules': modules,
+    'request': statistics.median(timings),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время запуска и обработки запроса в профиле prod '
+        'с подключённой панелью отладки и без неё'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, mode, options):
+        environ = dict(os.environ, DJANGO_ENV='prod')
+        results = []
+        for _ in range(options['repeat']):
+            process = subprocess.run(
+                [sys.executable, '-c', MEASURE, mode,
+                 str(options['requests'])],
+                cwd=settings.BASE_DIR, env=environ,
+                capture_output=True, text=True,
+            )
+            if process.returncode:
+                raise CommandError(process.stderr)
+            results.append(json.loads(process.stdout))
+        # Лучший из повторов меньше всего зависит от дискового кэша
+        return {
+            key: min(result[key] for result in results)
+            for key in results[0]
+        }
+
+    def handle(self, *args, **options):
+        modes = (
+            ('prod с debug_toolbar, как раньше', 'toolbar'),
+            ('prod', 'plain'),
+        )
+        for title, mode in modes:
+            result = self.measure(mode, options)
+            self.stdout.write(
+                f'{title}: запуск {result["startup"] * 1000:.0f} мс, '
+                f'модулей {result["modules"]}, '
+                f'запрос {result["request"] * 1e6:.0f} мкс'
+            )
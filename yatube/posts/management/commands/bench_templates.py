@@ -0,0 +1,116 @@
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.template.base import Template
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Follow, Post
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время разбора и отрисовки каждого шаблона страниц '
+        'ленты с кэширующим загрузчиком и без него'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def urls(self):
+        follow = Follow.objects.select_related('user').first()
+        post = Post.objects.filter(group__isnull=False).select_related(
+            'author', 'group'
+        ).first()
+        if not (follow and post):
+            raise CommandError(
+                'База пуста, сначала выполните manage.py seed_posts'
+            )
+        return follow.user, [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[post.group.slug]),
+            reverse('posts:profile', args=[post.author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+        ]
+
+    def instrument(self, compiled, rendered):
+        """Подменяет разбор и отрисовку шаблона замером времени."""
+        compile_nodelist = Template.compile_nodelist
+        render = Template._render
+
+        def timed_compile(template):
+            started = time.perf_counter()
+            try:
+                return compile_nodelist(template)
+            finally:
+                compiled[template.name] += time.perf_counter() - started
+
+        def timed_render(template, context):
+            started = time.perf_counter()
+            try:
+                return render(template, context)
+            finally:
+                rendered[template.name] += time.perf_counter() - started
+
+        Template.compile_nodelist = timed_compile
+        Template._render = timed_render
+        return compile_nodelist, render
+
+    def measure(self, client, urls, loaders, repeat):
+        engine = engines['django'].engine
+        engine.template_loaders = engine.get_template_loaders(loaders)
+        compiled, rendered = defaultdict(float), defaultdict(float)
+        originals = self.instrument(compiled, rendered)
+        total = 0
+        try:
+            for _ in range(repeat):
+                for url in urls:
+                    # Без кэша фрагментов шаблон отрисовывается целиком
+                    cache.clear()
+                    started = time.perf_counter()
+                    client.get(url)
+                    total += time.perf_counter() - started
+        finally:
+            Template.compile_nodelist, Template._render = originals
+        requests = repeat * len(urls)
+        return total / requests, {
+            name: (compiled[name] / requests, rendered[name] / requests)
+            for name in set(compiled) | set(rendered)
+        }
+
+    def handle(self, *args, **options):
+        user, urls = self.urls()
+        client = Client()
+        client.force_login(user)
+        modes = (
+            ('Без кэша загрузчика', LOADERS),
+            ('cached.Loader', [('django.template.loaders.cached.Loader',
+                                LOADERS)]),
+        )
+        for title, loaders in modes:
+            per_request, templates = self.measure(
+                client, urls, loaders, options['repeat']
+            )
+            compiling = sum(compile for compile, _ in templates.values())
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{title}: запрос {per_request * 1000:.2f} мс, '
+                f'из них разбор шаблонов {compiling * 1000:.2f} мс'
+            ))
+            # Время отрисовки включает вложенные шаблоны
+            for name, (compile, render) in sorted(
+                templates.items(), key=lambda item: -sum(item[1])
+            ):
+                self.stdout.write(
+                    f'  {name}: разбор {compile * 1000:.3f} мс, '
+                    f'отрисовка {render * 1000:.3f} мс'
+                )
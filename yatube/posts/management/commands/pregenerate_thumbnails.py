@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.workers import pool
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Пережимает картинки существующих постов и создаёт '
+        'недостающие миниатюры'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS,
+            help='Число процессов; 0 — создавать в текущем процессе',
+        )
+
+    def handle(self, *args, **options):
+        names = list(Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct())
+        workers = options['workers']
+        if workers:
+            with pool(workers) as executor:
+                list(executor.map(thumbnails.prepare, names, chunksize=20))
+        else:
+            for name in names:
+                thumbnails.prepare(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(names)}'
+        ))
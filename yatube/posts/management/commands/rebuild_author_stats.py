@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import AuthorStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает статистику авторов '
+        'по постам, комментариям и подпискам'
+    )
+
+    def handle(self, *args, **options):
+        total = AuthorStats.objects.rebuild_all()
+        self.stdout.write(
+            self.style.SUCCESS(f'Статистика пересчитана для {total} авторов')
+        )
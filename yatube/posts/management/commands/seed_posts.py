@@ -0,0 +1,136 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts import counts, search, timeline
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 500
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать даты полей auto_now_add при bulk_create."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу большим набором пользователей, постов и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Подписок на одного пользователя',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        prefix = f'seed{User.objects.count()}_'
+
+        users = User.objects.bulk_create(
+            (
+                User(username=f'{prefix}{i}', password='!')
+                for i in range(options['users'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+        groups = Group.objects.bulk_create(
+            (
+                Group(
+                    title=f'Группа {prefix}{i}',
+                    slug=f'{prefix}{i}'.replace('_', '-'),
+                    description='Сгенерированная группа',
+                )
+                for i in range(options['groups'])
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        group_ids = list(Group.objects.filter(
+            slug__startswith=prefix.replace('_', '-')
+        ).values_list('pk', flat=True)) + [None]
+
+        now = timezone.now()
+        with explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            Post.objects.bulk_create(
+                (
+                    Post(
+                        text=f'Сгенерированный пост {i}',
+                        author_id=rnd.choice(user_ids),
+                        group_id=rnd.choice(group_ids),
+                        pub_date=now - timedelta(minutes=i),
+                    )
+                    for i in range(options['posts'])
+                ),
+                batch_size=BATCH_SIZE,
+            )
+            post_ids = list(Post.objects.filter(
+                author_id__in=user_ids
+            ).values_list('pk', flat=True))
+            if post_ids:
+                Comment.objects.bulk_create(
+                    (
+                        Comment(
+                            text=f'Сгенерированный комментарий {i}',
+                            post_id=rnd.choice(post_ids),
+                            author_id=rnd.choice(user_ids),
+                            created=now - timedelta(seconds=i),
+                        )
+                        for i in range(options['comments'])
+                    ),
+                    batch_size=BATCH_SIZE,
+                )
+
+        follows = {
+            (user_id, author_id)
+            for user_id in user_ids
+            for author_id in rnd.sample(
+                user_ids, min(options['follows'], len(user_ids))
+            )
+            if user_id != author_id
+        }
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in follows
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+        AuthorStats.objects.rebuild_all()
+        Post.objects.refresh_comments_count()
+        search.get_backend().rebuild()
+        for user_id, author_id in follows:
+            timeline.backfill(user_id, author_id)
+        # Статистика планировщика нужна и для оценки размера лент
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cache.delete(counts.INDEX_KEY)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {options["posts"]}, комментариев {options["comments"]}, '
+            f'подписок {len(follows)}'
+        ))
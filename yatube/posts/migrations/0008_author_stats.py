@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-17 20:43
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    counters = {}
+    sources = (
+        ('posts_count', apps.get_model('posts', 'Post'), 'author'),
+        ('comments_count', apps.get_model('posts', 'Comment'), 'author'),
+        ('followers_count', apps.get_model('posts', 'Follow'), 'author'),
+        ('following_count', apps.get_model('posts', 'Follow'), 'user'),
+    )
+    for field, model, key in sources:
+        rows = model.objects.order_by().values(key).annotate(total=Count('pk'))
+        for row in rows:
+            counters.setdefault(row[key], {})[field] = row['total']
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(author_id=author_id, **fields)
+            for author_id, fields in counters.items()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_auto_20230325_1743'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('comments_count', models.PositiveIntegerField(default=0, verbose_name='Комментариев')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'Статистика автора',
+                'verbose_name_plural': 'Статистика авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='authorstats',
+            name='author',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
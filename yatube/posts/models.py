@@ -1,9 +1,29 @@
+from collections import defaultdict
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для лент: автор и группа подгружаются одним запросом."""
+        return self.select_related('author', 'group').order_by('-pub_date')
+
+    def refresh_comments_count(self):
+        """Пересчитывает счётчик комментариев, например после bulk_create."""
+        counts = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post').annotate(total=Count('pk')).values('total')
+        return self.update(comments_count=Coalesce(
+            Subquery(counts, output_field=models.IntegerField()), 0
+        ))
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -30,9 +50,26 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Поддерживается сигналами комментариев, чтобы не считать COUNT(*)
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_date_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -71,10 +108,69 @@ class Comment(models.Model):
 
     created = models.DateTimeField('Дата публикации', auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.text
 
 
+class FollowManager(models.Manager):
+    def follow(self, user, author):
+        """Подписывает одним INSERT; повторная подписка не ошибка.
+
+        Уникальный индекс (user, author) сам отсекает дубликаты, поэтому
+        одновременные клики не создают двух подписок.
+        """
+        if user.pk == author.pk:
+            return False
+        try:
+            with transaction.atomic():
+                self.create(user=user, author=author)
+        except IntegrityError:
+            return False
+        return True
+
+    def unfollow(self, user, author):
+        deleted, _ = self.filter(user=user, author=author).delete()
+        return bool(deleted)
+
+    def follow_many(self, user, author_ids):
+        """Массовая подписка для импорта; возвращает число новых подписок.
+
+        Строки вставляются пачками без сигналов, поэтому статистика,
+        ленты подписок и поколения кэша обновляются здесь же.
+        """
+        from . import cache, timeline
+
+        author_ids = set(author_ids) - {user.pk}
+        with transaction.atomic():
+            new_ids = author_ids - set(self.filter(
+                user=user, author_id__in=author_ids
+            ).values_list('author_id', flat=True))
+            self.bulk_create(
+                (self.model(user=user, author_id=pk) for pk in new_ids),
+                batch_size=500,
+                ignore_conflicts=True,
+            )
+            AuthorStats.objects.rebuild(user.pk)
+            AuthorStats.objects.refresh_followers(new_ids)
+            for author_id in new_ids:
+                timeline.backfill(user.pk, author_id)
+        usernames = User.objects.filter(pk__in=new_ids).values_list(
+            'username', flat=True
+        )
+        cache.bump_on_write(
+            f'follows:{user.pk}',
+            *(f'profile:{username}' for username in usernames),
+        )
+        return len(new_ids)
+
+
 class Follow(models.Model):
     author = models.ForeignKey(
         User,
@@ -87,7 +183,179 @@ class Follow(models.Model):
         related_name='follower'
     )
 
+    objects = FollowManager()
+
     class Meta:
-        constraints = models.UniqueConstraint(
-            fields=['author', 'user'], name='unique_follower'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follower'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow',
+            ),
+        ]
+
+
+class AuthorStatsManager(models.Manager):
+    def counters(self, author_id):
+        return {
+            'posts_count': Post.objects.filter(author_id=author_id).count(),
+            'comments_count': Comment.objects.filter(
+                author_id=author_id
+            ).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=author_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=author_id
+            ).count(),
+        }
+
+    def rebuild(self, author_id):
+        """Пересчитывает статистику одного автора по исходным таблицам."""
+        stats, _ = self.update_or_create(
+            author_id=author_id, defaults=self.counters(author_id)
+        )
+        return stats
+
+    def rebuild_all(self):
+        """Пересчитывает статистику всех авторов группирующими запросами.
+
+        Авторам, которые после пересчёта оказались не выше
+        TIMELINE_FANOUT_LIMIT, ленты подписчиков дополняются их постами.
+        """
+        from . import timeline
+
+        celebrity_ids = set(self.filter(
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('author_id', flat=True))
+        counters = defaultdict(dict)
+        sources = (
+            ('posts_count', Post.objects, 'author'),
+            ('comments_count', Comment.objects, 'author'),
+            ('followers_count', Follow.objects, 'author'),
+            ('following_count', Follow.objects, 'user'),
         )
+        for field, queryset, key in sources:
+            rows = queryset.order_by().values(key).annotate(total=Count('pk'))
+            for row in rows:
+                counters[row[key]][field] = row['total']
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                (
+                    self.model(author_id=author_id, **fields)
+                    for author_id, fields in counters.items()
+                ),
+                batch_size=500,
+            )
+            for author_id in celebrity_ids:
+                followers = counters.get(author_id, {}).get(
+                    'followers_count', 0
+                )
+                if followers <= settings.TIMELINE_FANOUT_LIMIT:
+                    timeline.catch_up(author_id)
+        return len(counters)
+
+    def refresh_followers(self, author_ids):
+        """Пересчитывает число подписчиков авторов одним UPDATE."""
+        followers = Follow.objects.filter(
+            author_id=OuterRef('author_id')
+        ).order_by().values('author_id').annotate(
+            total=Count('pk')
+        ).values('total')
+        self.filter(author_id__in=author_ids).update(
+            followers_count=Subquery(followers)
+        )
+        missing = set(author_ids) - set(self.filter(
+            author_id__in=author_ids
+        ).values_list('author_id', flat=True))
+        for author_id in missing:
+            self.rebuild(author_id)
+
+    def for_author(self, author):
+        """Статистика автора для чтения.
+
+        Если записи ещё нет, счётчики считаются по исходным таблицам, но
+        не сохраняются: страница, открытая GET-запросом, в базу не пишет.
+        """
+        try:
+            return self.get(author=author)
+        except self.model.DoesNotExist:
+            return self.model(author=author, **self.counters(author.pk))
+
+    def bump(self, author_id, **deltas):
+        """Сдвигает счётчики автора на заданные величины.
+
+        Если записи ещё нет, при увеличении она строится с нуля,
+        при уменьшении (в том числе при каскадном удалении автора)
+        ничего не делается.
+        """
+        with transaction.atomic():
+            updated = self.filter(author_id=author_id).update(**{
+                field: Greatest(F(field) + delta, 0)
+                for field, delta in deltas.items()
+            })
+            if not updated and all(
+                delta > 0 for delta in deltas.values()
+            ):
+                self.rebuild(author_id)
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.author}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок читателя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+
+    def __str__(self):
+        return f'{self.user} — {self.post}'
@@ -0,0 +1,197 @@
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT = 'next'
+ELLIPSIS = '…'
+PREVIOUS = 'prev'
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: без номера и общего количества."""
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Page cursor %s>' % (self.cursor or 'first')
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу сортировки вместо COUNT(*) и OFFSET.
+
+    Курсор хранит значения полей сортировки крайнего поста страницы,
+    поэтому любая страница выбирается одним диапазонным запросом.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+
+    def _fields(self):
+        opts = self.object_list.model._meta
+        for name in self.ordering:
+            name = name.lstrip('-')
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+            yield name, field
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            field.value_to_string(obj) for _, field in self._fields()
+        ]
+        return urlsafe_base64_encode(
+            json.dumps([direction] + values).encode()
+        )
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, *values = json.loads(urlsafe_base64_decode(cursor))
+            values = [
+                field.to_python(value)
+                for (_, field), value in zip(self._fields(), values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise ValueError('Некорректный курсор')
+        if direction not in (NEXT, PREVIOUS) or (
+            len(values) != len(self.ordering)
+        ):
+            raise ValueError('Некорректный курсор')
+        return direction, values
+
+    def _keyset_filter(self, values, backwards=False):
+        """Условие «строго после курсора» для составного ключа."""
+        condition = Q()
+        equal = Q()
+        for (name, _), ordering, value in zip(
+            self._fields(), self.ordering, values
+        ):
+            descending = ordering.startswith('-') != backwards
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else '-' + name
+            for name in self.ordering
+        ]
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору; без курсора — первую."""
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = self.decode_cursor(cursor)
+            except ValueError:
+                cursor = None
+
+        if direction == PREVIOUS:
+            queryset = self.object_list.filter(
+                self._keyset_filter(values, backwards=True)
+            ).order_by(*self._reversed_ordering())
+            items = list(queryset[:self.per_page + 1])
+            if not items:
+                return self.get_page(None)
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page][::-1]
+            return CursorPage(
+                items, self, cursor,
+                next_cursor=self.encode_cursor(NEXT, items[-1]),
+                previous_cursor=(
+                    self.encode_cursor(PREVIOUS, items[0])
+                    if has_more else None
+                ),
+            )
+
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values))
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        return CursorPage(
+            items, self, cursor,
+            next_cursor=(
+                self.encode_cursor(NEXT, items[-1]) if has_more else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(PREVIOUS, items[0])
+                if cursor and items else None
+            ),
+        )
+
+
+def elided_page_range(page, on_each_side=3, on_ends=2):
+    """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS.
+
+    Повторяет Paginator.get_elided_page_range из Django 3.2: ссылок
+    выводится не больше 2 * (on_each_side + on_ends) + 3, сколько бы
+    страниц ни было в ленте.
+    """
+    number, num_pages = page.number, page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2:
+        yield from page.paginator.page_range
+        return
+    if number > 1 + on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+class FeedPaginator(Paginator):
+    """Пагинатор, которому общее число постов сообщает функция ``count``.
+
+    Без неё число получается обычным COUNT(*). Функция может вернуть
+    оценку: тогда последние страницы окажутся пустыми или недоступными,
+    но номер и содержимое остальных от этого не меняются.
+    """
+
+    def __init__(self, object_list, per_page, count=None):
+        super().__init__(object_list, per_page)
+        self.count_func = count
+
+    @cached_property
+    def count(self):
+        if self.count_func is None:
+            return super().count
+        return self.count_func(self.object_list)
+
+
+def paginate(request, queryset, count=None):
+    """Страница ленты в режиме пагинации, выбранном в настройках.
+
+    ``count`` получает queryset и возвращает общее число постов, см.
+    posts.counts; курсорной пагинации оно не нужно.
+    """
+    if settings.CURSOR_PAGINATION:
+        paginator = CursorPaginator(queryset, settings.AMOUNT_POSTS_NUMBER)
+        return paginator.get_page(request.GET.get('cursor'))
+    paginator = FeedPaginator(
+        queryset, settings.AMOUNT_POSTS_NUMBER, count=count
+    )
+    return paginator.get_page(request.GET.get('page'))
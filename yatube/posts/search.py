@@ -0,0 +1,209 @@
+"""Полнотекстовый поиск по постам.
+
+Индекс хранит сама база: в SQLite это виртуальная таблица FTS5, которую
+сигналы обновляют при сохранении и удалении постов, в PostgreSQL —
+GIN-индекс по ``to_tsvector``, который база поддерживает сама. Бэкенд
+выбирается по движку базы или настройкой ``POST_SEARCH_BACKEND``.
+
+Бэкенд PostgreSQL экспериментальный и не проверен: задача CI запускается
+только в репозитории курса, а здесь тесты идут на SQLite. Перед
+включением прогоните их с ``DB_ENGINE=postgresql``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+PG_CONFIG = 'russian'
+
+WORD = re.compile(r'\w+')
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности.
+
+    Ведёт себя как последовательность для ``Paginator``: срез выбирает
+    из индекса только идентификаторы нужной страницы, посты подгружаются
+    одним запросом.
+    """
+
+    def __init__(self, backend, query):
+        self.backend = backend
+        self.query = query
+
+    def count(self):
+        return self.backend.count(self.query)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        ids = self.backend.ranked_ids(
+            self.query, start,
+            None if item.stop is None else item.stop - start,
+        )
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+class BaseSearchBackend:
+    def search(self, query):
+        """Посты по запросу пользователя, самые релевантные первыми."""
+        return SearchResults(self, query)
+
+    def filter(self, queryset, query):
+        """Сужает queryset постов до совпадений, не меняя порядка."""
+        raise NotImplementedError
+
+    def count(self, query):
+        raise NotImplementedError
+
+    def ranked_ids(self, query, offset, limit):
+        raise NotImplementedError
+
+    def index(self, post):
+        """Обновляет пост в индексе."""
+
+    def remove(self, post_id):
+        """Удаляет пост из индекса."""
+
+    def rebuild(self):
+        """Строит индекс заново, например после bulk_create."""
+
+
+class SqliteSearchBackend(BaseSearchBackend):
+    @staticmethod
+    def match(query):
+        # Слова запроса экранируются, чтобы пользовательский ввод не
+        # разбирался как синтаксис FTS5, и ищутся как префиксы
+        return ' '.join(f'"{word}"*' for word in WORD.findall(query))
+
+    def filter(self, queryset, query):
+        match = self.match(query)
+        if not match:
+            return queryset.none()
+        # Через RawSQL в pk__in подзапрос получил бы вторые скобки и стал
+        # бы скалярным: SQLite сравнивал бы id только с первой строкой
+        return queryset.extra(where=[
+            f'posts_post.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ], params=[match])
+
+    def count(self, query):
+        match = self.match(query)
+        if not match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [match],
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, query, offset, limit):
+        match = self.match(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [match, -1 if limit is None else limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [post.pk, post.text],
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                f'SELECT id, text FROM posts_post'
+            )
+            # Слияние сегментов ускоряет поиск после массовой вставки
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Экспериментальный, тестами не проверен (см. описание модуля)."""
+
+    # Выражение совпадает с выражением индекса post_text_search_idx,
+    # иначе планировщик им не воспользуется. Столбец указан с таблицей:
+    # в filter() queryset может присоединить комментарии со своим text
+    vector = f"to_tsvector('{PG_CONFIG}', posts_post.text)"
+    condition = f"{vector} @@ plainto_tsquery('{PG_CONFIG}', %s)"
+
+    def filter(self, queryset, query):
+        return queryset.extra(where=[self.condition], params=[query])
+
+    def count(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM posts_post WHERE {self.condition}',
+                [query],
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, query, offset, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM posts_post WHERE {self.condition} '
+                f"ORDER BY ts_rank({self.vector}, "
+                f"plainto_tsquery('{PG_CONFIG}', %s)) DESC, id DESC "
+                f'LIMIT %s OFFSET %s',
+                [query, query, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class LikeSearchBackend(BaseSearchBackend):
+    """Запасной вариант для баз без полнотекстового индекса."""
+
+    def filter(self, queryset, query):
+        for word in WORD.findall(query):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+
+    def count(self, query):
+        return self.filter(Post.objects.all(), query).count()
+
+    def ranked_ids(self, query, offset, limit):
+        ids = self.filter(Post.objects.order_by('-pub_date'), query)
+        ids = ids.values_list('pk', flat=True)[offset:]
+        return list(ids if limit is None else ids[:limit])
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    if settings.POST_SEARCH_BACKEND:
+        return import_string(settings.POST_SEARCH_BACKEND)()
+    return BACKENDS.get(connection.vendor, LikeSearchBackend)()
@@ -0,0 +1,107 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counts, search, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+
+def post_scopes(post):
+    scopes = [
+        'index',
+        f'profile:{post.author.username}',
+        f'author:{post.author_id}',
+        f'post:{post.pk}',
+    ]
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    return scopes
+
+
+def follow_scopes(follow):
+    return [
+        f'profile:{follow.author.username}',
+        f'follows:{follow.user_id}',
+    ]
+
+
+@receiver(pre_save, sender=Post)
+def post_moving(sender, instance, **kwargs):
+    """При смене группы сбрасывает кэш и прежней группы.
+
+    Заодно берёт свежий счётчик комментариев: пост, прочитанный формой
+    раньше, не должен затереть комментарии, добавленные с тех пор.
+    """
+    if instance.pk is None:
+        return
+    stored = Post.objects.filter(pk=instance.pk).values_list(
+        'group__slug', 'comments_count'
+    ).first()
+    if stored is None:
+        return
+    old_slug, instance.comments_count = stored
+    if old_slug:
+        cache.bump_on_write(f'group:{old_slug}')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    cache.bump_on_write(*post_scopes(instance))
+    search.get_backend().index(instance)
+    if instance.image:
+        thumbnails.enqueue(instance.image.name)
+    if created:
+        AuthorStats.objects.bump(instance.author_id, posts_count=1)
+        transaction.on_commit(lambda: counts.shift(counts.INDEX_KEY, 1))
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.bump_on_write(*post_scopes(instance))
+    search.get_backend().remove(instance.pk)
+    AuthorStats.objects.bump(instance.author_id, posts_count=-1)
+    transaction.on_commit(lambda: counts.shift(counts.INDEX_KEY, -1))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    cache.bump_on_write(f'post:{instance.post_id}')
+    if created:
+        AuthorStats.objects.bump(instance.author_id, comments_count=1)
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    cache.bump_on_write(f'post:{instance.post_id}')
+    AuthorStats.objects.bump(instance.author_id, comments_count=-1)
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    cache.bump_on_write(*follow_scopes(instance))
+    if created:
+        AuthorStats.objects.bump(instance.author_id, followers_count=1)
+        AuthorStats.objects.bump(instance.user_id, following_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    cache.bump_on_write(*follow_scopes(instance))
+    AuthorStats.objects.bump(instance.author_id, followers_count=-1)
+    AuthorStats.objects.bump(instance.user_id, following_count=-1)
+    timeline.unfollowed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    cache.bump_on_write(f'group:{instance.slug}')
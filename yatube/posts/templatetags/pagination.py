@@ -0,0 +1,16 @@
+from django import template
+
+from posts import paginator
+
+register = template.Library()
+
+
+@register.simple_tag
+def elided_page_range(page_obj):
+    return list(paginator.elided_page_range(page_obj))
+
+
+@register.filter
+def is_ellipsis(item):
+    """Пропуск в списке номеров страниц из ``elided_page_range``."""
+    return item == paginator.ELLIPSIS
@@ -0,0 +1,12 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post):
+    if not hasattr(post, 'picture'):
+        thumbnails.with_thumbnails([post])
+    return {'picture': post.picture}
@@ -1,13 +1,23 @@
 import shutil
 import tempfile
+import tracemalloc
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image, PngImagePlugin
 
+from posts import thumbnails, views
 from posts.forms import PostForm, CommentForm
 from posts.models import Group, Post, User, Comment
+from posts.uploads import OversizedUploadedFile
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -96,6 +106,294 @@ class PostFormTests(TestCase):
         )
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Blanc')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, name):
+        return SimpleUploadedFile(
+            name=name,
+            content=(
+                b'\x47\x49\x46\x38\x39\x61\x02\x00'
+                b'\x01\x00\x80\x00\x00\x00\x00\x00'
+                b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+                b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+                b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+                b'\x0A\x00\x3B'
+            ),
+            content_type='image/gif',
+        )
+
+    def test_create_post_enqueues_thumbnails(self):
+        """Публикация с картинкой ставит миниатюры в очередь."""
+        with mock.patch('posts.thumbnails.enqueue') as enqueue:
+            self.client.post(reverse('posts:post_create'), data={
+                'text': 'Текст',
+                'image': self.upload('queued.gif'),
+            })
+        post = Post.objects.get(author=self.author)
+        enqueue.assert_called_once_with(post.image.name)
+
+    def test_request_does_not_resize(self):
+        """Без готовой миниатюры страница показывает оригинал."""
+        with mock.patch('posts.thumbnails.enqueue'):
+            post = Post.objects.create(
+                text='Текст', author=self.author,
+                image=self.upload('lazy.gif'),
+            )
+        backend = thumbnails.QueuedThumbnailBackend
+        with mock.patch('posts.thumbnails.enqueue') as enqueue:
+            with mock.patch.object(backend, 'generate') as generate:
+                response = self.client.get(reverse('posts:index'))
+        generate.assert_not_called()
+        enqueue.assert_not_called()
+        self.assertContains(response, f'src="{post.image.url}"')
+
+        thumbnails.generate(post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+        self.assertNotContains(response, f'src="{post.image.url}"')
+        self.assertContains(response, f'src="{settings.MEDIA_URL}cache/')
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_missing_thumbnails_queued_once(self):
+        """Картинка без миниатюр попадает в пул один раз, сколько бы
+        страниц её ни показали."""
+        with mock.patch('posts.thumbnails.enqueue'):
+            post = Post.objects.create(
+                text='Текст', author=self.author,
+                image=self.upload('pending.gif'),
+            )
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit',
+            side_effect=lambda func: func(),
+        ), mock.patch('posts.thumbnails.get_executor') as get_executor:
+            thumbnails.with_thumbnails([post])
+            thumbnails.with_thumbnails([post])
+        get_executor().submit.assert_called_once_with(
+            thumbnails.prepare, post.image.name
+        )
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_broken_pool_is_replaced(self):
+        """Сломанный пул заменяется новым, а запрос не падает."""
+        broken, fresh = mock.Mock(), mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool
+        with mock.patch.object(thumbnails, '_executor', None), \
+                mock.patch('posts.thumbnails.workers.pool',
+                           side_effect=[broken, fresh]), \
+                self.assertLogs('posts.thumbnails', 'ERROR'):
+            thumbnails.submit('posts/broken.gif')
+            self.assertIs(thumbnails._executor, fresh)
+        fresh.submit.assert_called_once_with(
+            thumbnails.prepare, 'posts/broken.gif'
+        )
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_pool_failure_releases_pending_key(self):
+        """Если пул не принял задание, картинку можно поставить снова."""
+        name = 'posts/lost.gif'
+        with mock.patch('posts.thumbnails.get_executor') as get_executor:
+            get_executor().submit.side_effect = RuntimeError
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                thumbnails.submit(name)
+        self.assertIsNone(cache.get(thumbnails.pending_key(name)))
+
+        future = Future()
+        with mock.patch('posts.thumbnails.get_executor') as get_executor:
+            get_executor().submit.return_value = future
+            thumbnails.submit(name)
+        self.assertTrue(cache.get(thumbnails.pending_key(name)))
+        future.set_exception(BrokenProcessPool())
+        self.assertIsNone(cache.get(thumbnails.pending_key(name)))
+
+    def test_page_thumbnails_resolved_in_one_query(self):
+        """Миниатюры страницы читаются из базы одним запросом."""
+        with mock.patch('posts.thumbnails.enqueue'):
+            for i in range(3):
+                Post.objects.create(
+                    text='Текст', author=self.author,
+                    image=self.upload(f'batch{i}.gif'),
+                )
+        posts = list(Post.objects.all())
+        for post in posts:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.with_thumbnails(posts)
+        for post in posts:
+            self.assertTrue(post.thumbnail.name.startswith('cache/'))
+            self.assertEqual(post.thumbnail.size, [960, 339])
+        with self.assertNumQueries(0):
+            thumbnails.with_thumbnails(posts)
+
+    @override_settings(POST_IMAGE_FORMATS=['AVIF', 'JPEG'])
+    def test_picture_lists_every_width(self):
+        """Разметка <picture> перечисляет все готовые ширины."""
+        with mock.patch('posts.thumbnails.enqueue'):
+            post = Post.objects.create(
+                text='Текст', author=self.author,
+                image=self.upload('picture.gif'),
+            )
+        thumbnails.generate(post.image.name)
+        # Форматы, которые этот Pillow не умеет сохранять, пропускаются
+        formats = [
+            format_ for format_ in settings.POST_IMAGE_FORMATS
+            if thumbnails.encodable(format_)
+        ]
+        self.assertIn('JPEG', formats)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        picture = response.context['picture']
+        self.assertEqual(
+            [mime for mime, _ in picture.formats],
+            [Image.MIME[format_] for format_ in formats],
+        )
+        self.assertEqual(
+            [size for size, _ in picture.formats[0][1]],
+            settings.POST_IMAGE_WIDTHS,
+        )
+        self.assertContains(response, f'srcset="{picture.srcset}"')
+        self.assertContains(response, 'width="960" height="339"')
+
+
+def peak_memory(func):
+    """Пик памяти, выделенной Python-кодом во время вызова."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_BYTES=1024 * 1024,
+    POST_IMAGE_MAX_PIXELS=10 ** 6,
+)
+class UploadLimitsTests(TestCase):
+    MEMORY_LIMIT = 4 * 1024 * 1024
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Blanc')
+        # 144 мегапикселя: в памяти Pillow это 144 МБ, в PNG — сотни КБ
+        buffer = BytesIO()
+        Image.new('L', (12000, 12000)).save(buffer, 'PNG')
+        cls.bomb = buffer.getvalue()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, name, content):
+        request = RequestFactory().post(reverse('posts:post_create'), {
+            'text': 'Текст',
+            'image': SimpleUploadedFile(name, content, 'image/png'),
+        })
+        request.user = self.author
+        response = None
+
+        def view():
+            nonlocal response
+            response = views.post_create(request)
+        peak = peak_memory(view)
+        return request, response, peak
+
+    def test_oversized_upload_is_cut_off(self):
+        """Файл больше лимита не читается целиком и не сохраняется."""
+        request, response, peak = self.create('big.png', b'0' * 8 * 1024 ** 2)
+        self.assertIsInstance(request.FILES['image'], OversizedUploadedFile)
+        self.assertContains(response, 'Файл больше')
+        self.assertFalse(Post.objects.exists())
+        self.assertLess(peak, self.MEMORY_LIMIT, f'Пик памяти {peak} байт')
+
+    def test_pixel_limit_checked_before_decode(self):
+        """Огромная по пикселям картинка отклоняется по заголовку."""
+        self.assertLess(len(self.bomb), settings.POST_IMAGE_MAX_BYTES)
+        with self.assertWarns(Image.DecompressionBombWarning):
+            _, response, peak = self.create('bomb.png', self.bomb)
+        self.assertContains(response, 'слишком большая')
+        self.assertFalse(Post.objects.exists())
+        self.assertLess(peak, self.MEMORY_LIMIT, f'Пик памяти {peak} байт')
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_normalize_caps_resolution_and_strips_exif(self):
+        """Воркер уменьшает оригинал и удаляет EXIF, не меняя имени."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (3000, 2000)).save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        name = default_storage.save('posts/photo.jpg', BytesIO(
+            buffer.getvalue()
+        ))
+        thumbnails.normalize(name)
+        with default_storage.open(name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.size, (1000, 667))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=1000)
+    def test_normalize_strips_exif_from_png(self):
+        """EXIF удаляется и из PNG, повёрнутого по ориентации."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        buffer = BytesIO()
+        Image.new('RGB', (3000, 2000)).save(
+            buffer, 'PNG', exif=exif.tobytes()
+        )
+        name = default_storage.save('posts/rotated.png', BytesIO(
+            buffer.getvalue()
+        ))
+        thumbnails.normalize(name)
+        with default_storage.open(name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.size, (667, 1000))
+            self.assertNotIn('exif', image.info)
+        with mock.patch('posts.thumbnails._replace') as replace:
+            thumbnails.normalize(name)
+        replace.assert_not_called()
+
+    def test_normalize_strips_png_text_from_small_image(self):
+        """Текстовые блоки PNG удаляются и у картинки меньше предела."""
+        info = PngImagePlugin.PngInfo()
+        info.add_text('Comment', 'Широта 55.75, долгота 37.62')
+        buffer = BytesIO()
+        Image.new('RGB', (200, 100)).save(buffer, 'PNG', pnginfo=info)
+        name = default_storage.save('posts/tagged.png', BytesIO(
+            buffer.getvalue()
+        ))
+        thumbnails.normalize(name)
+        with default_storage.open(name) as stored:
+            image = Image.open(stored)
+            self.assertEqual(image.size, (200, 100))
+            self.assertEqual(image.info, {})
+        with mock.patch('posts.thumbnails._replace') as replace:
+            thumbnails.normalize(name)
+        replace.assert_not_called()
+
+
 class CommentFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
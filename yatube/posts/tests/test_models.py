@@ -1,6 +1,14 @@
+from io import StringIO
+
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
 
-from posts.models import Group, Post, User
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -83,3 +91,79 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     group._meta.get_field(field).help_text, expected_value)
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def assertStats(self, user, **expected):
+        stats = AuthorStats.objects.get(author=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_counters_follow_create_and_delete(self):
+        """Счётчики меняются при создании и удалении записей."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        Post.objects.create(author=self.author, text='Текст')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStats(self.author, posts_count=2, followers_count=1)
+        self.assertStats(self.reader, comments_count=1, following_count=1)
+
+        comment.delete()
+        post.delete()
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertStats(self.author, posts_count=1, followers_count=0)
+        self.assertStats(self.reader, comments_count=0, following_count=0)
+
+    def test_rebuild_command(self):
+        """Команда пересчёта восстанавливает счётчики."""
+        Post.objects.create(author=self.author, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(posts_count=100, followers_count=100)
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.reader, following_count=1)
+
+    def test_profile_reads_stats_row(self):
+        """Профиль берёт число постов из статистики автора."""
+        Post.objects.create(author=self.author, text='Текст')
+        AuthorStats.objects.filter(author=self.author).update(posts_count=7)
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertEqual(response.context['post_count'], 7)
+
+    def test_profile_without_stats_row_does_not_write(self):
+        """Без записи статистики профиль считает посты, не создавая её."""
+        Post.objects.create(author=self.author, text='Текст')
+        AuthorStats.objects.filter(author=self.author).delete()
+        response = self.client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertEqual(response.context['post_count'], 1)
+        self.assertFalse(
+            AuthorStats.objects.filter(author=self.author).exists()
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Прагмы есть только у SQLite')
+class SqlitePragmasTest(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Новое соединение получает прагмы из SQLITE_PRAGMAS."""
+        if not settings.SQLITE_PRAGMAS:
+            self.skipTest('Прагмы отключены')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
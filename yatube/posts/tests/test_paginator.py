@@ -0,0 +1,182 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+from posts.paginator import ELLIPSIS, CursorPaginator, elided_page_range
+from posts.tests.utils import on_commit
+
+
+@override_settings(CURSOR_PAGINATION=True, AMOUNT_POSTS_NUMBER=10)
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Текст {i}', author=cls.user, group=cls.group)
+            for i in range(13)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_feed_pages_walk_by_cursor(self):
+        """Все ленты листаются курсором вперёд и назад."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                self.assertEqual(list(first), expected[:10])
+                self.assertFalse(first.has_previous())
+
+                second = self.client.get(
+                    url, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(second), expected[10:])
+                self.assertFalse(second.has_next())
+
+                back = self.client.get(
+                    url, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), expected[:10])
+                self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertIsNone(page_obj.cursor)
+
+    def test_page_does_not_count_rows(self):
+        """Страница по курсору выбирается одним запросом без COUNT."""
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        cursor = paginator.get_page(None).next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.get_page(cursor)
+        self.assertEqual(len(page), 5)
+
+
+@override_settings(AMOUNT_POSTS_NUMBER=1)
+class ElidedPageRangeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        Post.objects.bulk_create(
+            Post(text=f'Текст {i}', author=cls.user) for i in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_page_range_is_elided(self):
+        """Выводятся края ленты и окно вокруг текущей страницы."""
+        page_obj = Paginator(range(30), 1).page(15)
+        self.assertEqual(
+            list(elided_page_range(page_obj)),
+            [1, 2, ELLIPSIS, 12, 13, 14, 15, 16, 17, 18, ELLIPSIS, 29, 30],
+        )
+        page_obj = Paginator(range(5), 1).page(3)
+        self.assertEqual(list(elided_page_range(page_obj)), [1, 2, 3, 4, 5])
+
+    def test_feed_links_only_window(self):
+        """Лента ссылается только на страницы из окна."""
+        response = self.client.get(reverse('posts:index'), {'page': 15})
+        for number in (1, 2, 12, 18, 29, 30):
+            self.assertContains(response, f'?page={number}"')
+        for number in (3, 11, 19, 28):
+            self.assertNotContains(response, f'?page={number}"')
+        self.assertContains(response, ELLIPSIS, count=2)
+
+    def test_gap_is_recognised_by_constant(self):
+        """Шаблон узнаёт пропуск по ELLIPSIS, а не по самому символу."""
+        with mock.patch('posts.paginator.ELLIPSIS', '...'):
+            response = self.client.get(reverse('posts:index'), {'page': 15})
+        self.assertNotContains(response, '?page=...')
+        self.assertContains(
+            response, '<span class="page-link">...</span>', count=2
+        )
+
+
+@override_settings(AMOUNT_POSTS_NUMBER=2)
+class FeedCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(5):
+            Post.objects.create(text=f'Текст {i}', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def paginator_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            page_obj = self.client.get(url).context['page_obj']
+            count = page_obj.paginator.count
+        counted = any('COUNT(' in query['sql'] for query in queries)
+        return count, counted
+
+    def test_feed_counts_are_not_recounted(self):
+        """Главная лента и подписки не считают посты на каждый запрос."""
+        for url in (reverse('posts:index'), reverse('posts:follow_index')):
+            with self.subTest(url=url):
+                self.assertEqual(self.paginator_count(url), (5, True))
+                self.assertEqual(self.paginator_count(url), (5, False))
+                with on_commit():
+                    post = Post.objects.create(
+                        text='Новый', author=self.author
+                    )
+                self.assertEqual(self.paginator_count(url)[0], 6)
+                with on_commit():
+                    post.delete()
+                self.assertEqual(self.paginator_count(url)[0], 5)
+
+    def test_rolled_back_post_keeps_count(self):
+        """Откаченный пост не сдвигает счётчик главной ленты."""
+        url = reverse('posts:index')
+        self.paginator_count(url)
+        with on_commit():
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    Post.objects.create(text='Откат', author=self.author)
+                    raise RuntimeError
+        self.assertEqual(self.paginator_count(url), (5, False))
+
+    def test_huge_table_count_is_estimated(self):
+        """Для огромной таблицы берётся оценка по статистике базы."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.create(text='После ANALYZE', author=self.author)
+        cache.clear()
+        url = reverse('posts:index')
+        with override_settings(FEED_COUNT_ESTIMATE_FROM=1):
+            self.assertEqual(self.paginator_count(url), (5, False))
+        cache.clear()
+        self.assertEqual(self.paginator_count(url), (6, True))
@@ -1,5 +1,6 @@
 from http import HTTPStatus
 
+from django.conf import settings
 from django.test import Client, TestCase
 
 from posts.models import Group, Post, User
@@ -42,6 +43,14 @@ class PostURLTests(TestCase):
                 response = self.guest_client.get(url)
                 self.assertEqual(response.status_code, status_code)
 
+    def test_debug_toolbar_is_dev_only(self):
+        """Панель отладки не стоит на пути запроса в профиле prod."""
+        self.assertNotIn('debug_toolbar', settings.INSTALLED_APPS)
+        self.assertNotIn(
+            'debug_toolbar.middleware.DebugToolbarMiddleware',
+            settings.MIDDLEWARE,
+        )
+
     def test_create_post_url_redirect_anonymous(self):
         """Страница /create/ перенаправляет анонимного пользователя."""
         response = self.guest_client.get('/create/', follow=True)
@@ -1,9 +1,28 @@
+import asyncio
+from contextlib import ExitStack
+from unittest import mock
+
 from django import forms
-from django.test import Client, TestCase
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, transaction
+from django.http import HttpResponse
+from django.template import engines
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.cache import cache
-
-from posts.models import Group, Post, User, Follow
+from django.core.cache.backends.db import DatabaseCache
+
+from core import metrics as request_metrics
+from core.asgi import ASGIHandler
+from core.db import ReplicaRouter, replica_reads
+from core.templates import prewarm, template_names
+from core.middleware import STICKY_COOKIE, PrimaryDatabaseMiddleware
+from posts import cache as generations, search
+from posts.models import (AuthorStats, Comment, Follow, Group, Post,
+                          TimelineEntry, User)
+from posts.tests.utils import on_commit
 from yatube.settings import AMOUNT_POSTS_NUMBER
 
 
@@ -119,12 +138,13 @@ class PostPagesTests(TestCase):
 
     def test_first_page_contains_ten_records(self):
 
-        for _ in range(AMOUNT_POSTS_NUMBER + 3):
-            Post.objects.create(
-                text='Text',
-                author=self.user,
-                group=self.group,
-            )
+        with on_commit():
+            for _ in range(AMOUNT_POSTS_NUMBER + 3):
+                Post.objects.create(
+                    text='Text',
+                    author=self.user,
+                    group=self.group,
+                )
 
         response = self.client.get(reverse('posts:index'))
 
@@ -132,12 +152,13 @@ class PostPagesTests(TestCase):
             response.context['page_obj']), AMOUNT_POSTS_NUMBER)
 
     def test_second_page_contains_three_records(self):
-        for _ in range(AMOUNT_POSTS_NUMBER + 3):
-            Post.objects.create(
-                text='Text',
-                author=self.user,
-                group=self.group,
-            )
+        with on_commit():
+            for _ in range(AMOUNT_POSTS_NUMBER + 3):
+                Post.objects.create(
+                    text='Text',
+                    author=self.user,
+                    group=self.group,
+                )
 
         response = self.client.get(reverse('posts:index') + '?page=2')
         self.assertEqual(len(response.context['page_obj']), 4)
@@ -145,13 +166,375 @@ class PostPagesTests(TestCase):
     def test_cache_index(self):
         """Тестируем кэщ главной страницы"""
         cached_posts = self.guest_client.get(reverse('posts:index')).content
-        Post.objects.all().delete()
+        # update() не отправляет сигналов, поэтому фрагмент остаётся в кэше
+        Post.objects.update(text='Изменён в обход сигналов')
         response = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(cached_posts, response.content)
         cache.clear()
-        response = self.authorized_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(cached_posts, response.content)
 
+    def test_cache_index_invalidated_on_post_change(self):
+        """Новый и удалённый пост сразу видны на главной."""
+        self.guest_client.get(reverse('posts:index'))
+        post = Post.objects.create(text='Свежий пост', author=self.user)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+        post.delete()
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Свежий пост')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(text='Текст', author=cls.user, group=cls.group)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.user.username]),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_request_skips_database(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов к БД."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertTrue(first.has_header('ETag'))
+                with self.assertNumQueries(0):
+                    second = self.client.get(url)
+                self.assertEqual(first.content, second.content)
+
+    def test_not_modified(self):
+        """Совпавший ETag даёт ответ 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_post_invalidates_its_pages(self):
+        """Новый пост сбрасывает кэш своих ленты, группы и профиля."""
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_page_cached_before_commit_is_dropped(self):
+        """Страница, закэшированная до фиксации поста, после неё
+        не отдаётся."""
+        with on_commit():
+            post = Post.objects.create(
+                text='Свежий пост', author=self.user, group=self.group
+            )
+            # Другой запрос ещё видит строки без поста и кэширует их
+            old_rows = Post.objects.feed().exclude(pk=post.pk)
+            with mock.patch('posts.views.Post.objects.feed',
+                            return_value=old_rows):
+                self.client.get(self.urls[0])
+        self.assertContains(self.client.get(self.urls[0]), 'Свежий пост')
+
+    def test_unknown_group_generation_expires(self):
+        """Запрос к несуществующей группе не оставляет вечных ключей."""
+        with mock.patch('posts.cache.cache', wraps=cache) as wrapped:
+            response = self.client.get(
+                reverse('posts:group_list', args=['no-such-group'])
+            )
+        self.assertEqual(response.status_code, 404)
+        timeouts = [
+            call[0][2] for call in wrapped.add.call_args_list
+            if call[0][0].startswith('feed-generation:')
+        ]
+        self.assertEqual(timeouts, [settings.GENERATION_TIMEOUT])
+
+    def test_authorized_users_bypass_cache(self):
+        """Авторизованный пользователь получает свежую страницу."""
+        self.client.get(self.urls[0])
+        self.client.force_login(self.user)
+        response = self.client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Текст', author=cls.author, group=cls.group
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_read_views_answer_not_modified(self):
+        """Страницы чтения отвечают 304, не выполняя запросов к лентам."""
+        # Сессия и пользователь; странице поста нужен ещё её автор
+        urls = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_list', args=[self.group.slug]): 2,
+            reverse('posts:profile', args=[self.author.username]): 2,
+            reverse('posts:post_detail', args=[self.post.pk]): 3,
+            reverse('posts:follow_index'): 2,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(queries):
+                    self.assertNotModified(url, etag)
+
+    def test_comment_changes_post_detail_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_csrf_cookie_changes_post_detail_etag(self):
+        """Новая cookie CSRF меняет ETag страницы поста с формой."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'a' * 64
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_post_changes_follow_index_etag(self):
+        """Новый пост автора из подписок меняет ETag ленты подписок."""
+        url = reverse('posts:follow_index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class FeedQueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.group = Group.objects.create(
+            title='Общая группа',
+            slug='common',
+            description='Тестовое описание',
+        )
+        for i in range(20):
+            author = User.objects.create_user(username=f'author{i}')
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            Post.objects.create(text='Текст', author=author, group=group)
+            Post.objects.create(text='Текст', author=author, group=cls.group)
+            Follow.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with override_settings(AMOUNT_POSTS_NUMBER=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), per_page)
+        return len(queries)
+
+    def test_feed_query_count_does_not_grow_with_page_size(self):
+        """Число запросов ленты не зависит от размера страницы."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=['author0']),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                per_page = 2 if 'profile' in url else 5
+                self.assertEqual(
+                    self.count_queries(url, 1),
+                    self.count_queries(url, per_page),
+                )
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        for i in range(5):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def comments(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    @override_settings(COMMENTS_PER_PAGE=3)
+    def test_comments_are_paginated_by_cursor(self):
+        """Комментарии листаются курсором в порядке добавления."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            self.comments(response), [f'Комментарий {i}' for i in range(3)]
+        )
+        cursor = response.context['comments'].next_cursor
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual(self.comments(response),
+                         ['Комментарий 3', 'Комментарий 4'])
+
+    def test_comments_count_follows_changes(self):
+        """Счётчик комментариев поста растёт и уменьшается вместе с ними."""
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]),
+                         {'text': 'Новый'})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 6)
+        Comment.objects.filter(text='Новый').delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+        Post.objects.update(comments_count=0)
+        Post.objects.refresh_comments_count()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 5)
+
+    def test_cached_block_is_invalidated_by_new_comment(self):
+        """Блок комментариев берётся из кэша до появления нового."""
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse(any(
+            'posts_comment' in query['sql'] for query in queries
+        ))
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]),
+                         {'text': 'Свежий комментарий'})
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_query_count_does_not_grow_with_comments(self):
+        """Авторы комментариев выбираются вместе с ними."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        before = len(queries)
+        for i in range(5, 10):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(
+                post=self.post, author=author, text=f'Комментарий {i}'
+            )
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertEqual(len(queries), before)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(text='Старый', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_timeline_follows_subscriptions(self):
+        """Лента подписок заполняется при подписке и очищается при отписке."""
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 2
+        )
+
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_merged_on_read(self):
+        """Посты авторов с большим числом подписчиков не раскладываются."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_posts_skipped_over_limit_reach_feed(self):
+        """Автор, опустившийся до лимита, раскладывает пропущенные посты."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+
+        Follow.objects.filter(user=other).delete()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_rebuilt_stats_catch_up_timeline(self):
+        """Пересчёт статистики дополняет ленты бывших знаменитостей."""
+        Follow.objects.create(user=self.user, author=self.author)
+        AuthorStats.objects.filter(author=self.author).update(
+            followers_count=5
+        )
+        new_post = Post.objects.create(text='Новый', author=self.author)
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post))
+
+        AuthorStats.objects.rebuild_all()
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.assertTrue(TimelineEntry.objects.filter(post=new_post))
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -189,6 +572,60 @@ class FollowTest(TestCase):
         ).exists()
         self.assertIsNotNone(subscription)
 
+    def test_follow_is_idempotent(self):
+        """Повторная подписка и подписка на себя ничего не создают."""
+        self.assertTrue(Follow.objects.follow(self.user, self.author))
+        self.assertFalse(Follow.objects.follow(self.user, self.author))
+        self.assertFalse(Follow.objects.follow(self.user, self.user))
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+
+    def test_unique_index_rejects_duplicates(self):
+        """Дубликат подписки отсекается базой данных."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Follow.objects.create(user=self.user, author=self.author)
+
+    def test_follow_many(self):
+        """Массовая подписка пропускает существующие и обновляет счётчики."""
+        authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        Post.objects.create(text='Текст', author=authors[0])
+        Follow.objects.follow(self.user, authors[1])
+        created = Follow.objects.follow_many(
+            self.user, [a.pk for a in authors] + [self.user.pk]
+        )
+        self.assertEqual(created, 2)
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).following_count, 3
+        )
+        for author in authors:
+            with self.subTest(author=author.username):
+                self.assertEqual(
+                    AuthorStats.objects.get(author=author).followers_count, 1
+                )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 1
+        )
+
+    def test_follow_index_after_follow_many(self):
+        """Лента подписок сразу видит массовую подписку."""
+        cache.clear()
+        author = User.objects.create_user(username='bulk')
+        post = Post.objects.create(text='Текст', author=author)
+        url = reverse('posts:follow_index')
+        response = self.logged_in_client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        Follow.objects.follow_many(self.user, [author.pk])
+        response = self.logged_in_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [post])
+
     def correct_post_feed(self):
         Follow.objects.create(
             author=self.author,
@@ -208,3 +645,305 @@ class FollowTest(TestCase):
             reverse('posts:follow_index')
         )
         self.assertNotEqual(len(response.contex['page_obj']), 1)
+
+
+@override_settings(AMOUNT_POSTS_NUMBER=2)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc', is_staff=True,
+                                            is_superuser=True)
+        cls.best = Post.objects.create(
+            text='Ёжик ёжик ёжик в тумане', author=cls.user
+        )
+        cls.other = Post.objects.create(
+            text='Лошадь в тумане и ёжик', author=cls.user
+        )
+        cls.third = Post.objects.create(
+            text='Ёжики живут в лесу', author=cls.user
+        )
+        Post.objects.create(text='Совсем про другое', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query, page=None):
+        params = {'q': query}
+        if page:
+            params['page'] = page
+        return self.client.get(reverse('posts:search'), params)
+
+    def test_results_are_ranked_and_paginated(self):
+        """Поиск находит слова по префиксу, лучшие совпадения первыми."""
+        response = self.search('ёжик')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 3)
+        self.assertEqual(page_obj[0], self.best)
+        self.assertContains(response, '?q=%D1%91%D0%B6%D0%B8%D0%BA&amp;page=2')
+        second = self.search('ёжик', page=2).context['page_obj']
+        self.assertEqual(len(second), 1)
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other.text = 'Лошадь в тумане'
+        self.other.save()
+        self.third.delete()
+        self.assertEqual(
+            list(self.search('ёжик').context['page_obj']), [self.best]
+        )
+        self.assertEqual(
+            list(self.search('лошадь').context['page_obj']), [self.other]
+        )
+
+    def test_query_syntax_is_escaped(self):
+        """Спецсимволы запроса не ломают поиск."""
+        for query in ('"ёжик', 'NEAR(ёжик', '*', '   '):
+            with self.subTest(query=query):
+                response = self.search(query)
+                self.assertEqual(response.status_code, 200)
+
+    def test_filter_ignores_joined_comment_text(self):
+        """Поиск сужает queryset с комментариями по тексту поста."""
+        Comment.objects.create(
+            post=self.other, author=self.user, text='Про лошадь'
+        )
+        Comment.objects.create(
+            post=self.best, author=self.user, text='Ёжик'
+        )
+        queryset = Post.objects.filter(comments__text__icontains='лошад')
+        self.assertEqual(
+            list(search.get_backend().filter(queryset, 'ёжик')), [self.other]
+        )
+
+    def test_admin_uses_search_index(self):
+        """Поиск в админке идёт по тому же индексу."""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'лошадь'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
+
+
+@override_settings(DB_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def routed_reads(self, request, write=False):
+        seen = []
+
+        def view(request):
+            seen.append(self.router.db_for_read(Post))
+            if write:
+                Post.objects.create(text='Текст', author=self.user)
+                seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        response = PrimaryDatabaseMiddleware(view)(request)
+        return seen, response
+
+    def test_safe_requests_read_replicas(self):
+        """GET читает реплику, POST и команды — основную базу."""
+        seen, _ = self.routed_reads(self.factory.get('/'))
+        self.assertEqual(seen, ['replica1'])
+        seen, _ = self.routed_reads(self.factory.post('/'))
+        self.assertEqual(seen, [None])
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_write_pins_client_to_primary(self):
+        """После записи клиент какое-то время читает основную базу."""
+        seen, response = self.routed_reads(self.factory.get('/'), write=True)
+        self.assertEqual(seen, ['replica1', None])
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.DB_STICKY_SECONDS)
+
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = cookie.value
+        seen, response = self.routed_reads(request)
+        self.assertEqual(seen, [None])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_replica_reads_lagging_generation(self):
+        """Сразу после записи читающие реплику кэшируют отдельно."""
+        generations.bump('index')
+        primary = generations.generation('index')
+        with replica_reads():
+            self.assertNotEqual(generations.generation('index'), primary)
+            cache.delete('feed-lag:index')
+            self.assertEqual(generations.generation('index'), primary)
+
+    def test_cache_table_stays_on_primary(self):
+        """Таблица кэша читается из основной базы и не липнет к ней."""
+        entry = DatabaseCache('yatube_cache', {}).cache_model_class
+
+        def view(request):
+            seen.append(self.router.db_for_read(entry))
+            seen.append(self.router.db_for_write(entry))
+            seen.append(self.router.db_for_read(Post))
+            return HttpResponse()
+        seen = []
+        response = PrimaryDatabaseMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(seen, ['default', 'default', 'replica1'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+class AsgiHandlerTest(SimpleTestCase):
+    def call(self, application, scope, body=b''):
+        messages = [
+            {'type': 'http.request', 'body': body[:3], 'more_body': True},
+            {'type': 'http.request', 'body': body[3:]},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        handler = ASGIHandler(application, threads=2)
+        asyncio.run(handler(scope, receive, send))
+        handler.executor.shutdown()
+        return sent
+
+    def test_request_is_translated_to_wsgi(self):
+        """Путь, параметры, заголовки и тело доходят до приложения WSGI."""
+        def application(environ, start_response):
+            start_response('201 Created', [('X-Path', environ['PATH_INFO'])])
+            return [
+                environ['QUERY_STRING'].encode(),
+                environ['HTTP_X_TOKEN'].encode(),
+                environ['wsgi.input'].read(),
+            ]
+        start, body = self.call(application, {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/posts/1/',
+            'query_string': b'page=2',
+            'headers': [(b'x-token', b'abc')],
+        }, body=b'text=hello')
+        self.assertEqual(start['status'], 201)
+        self.assertEqual(start['headers'], [(b'x-path', b'/posts/1/')])
+        self.assertEqual(body['body'], b'page=2abctext=hello')
+
+    def test_root_path_goes_to_script_name(self):
+        """Префикс root_path попадает в SCRIPT_NAME, а не в PATH_INFO."""
+        environ = ASGIHandler.environ({
+            'type': 'http',
+            'method': 'GET',
+            'root_path': '/yatube',
+            'path': '/yatube/posts/1/',
+        }, None)
+        self.assertEqual(environ['SCRIPT_NAME'], '/yatube')
+        self.assertEqual(environ['PATH_INFO'], '/posts/1/')
+
+    def test_django_page_is_served(self):
+        """Страница Django отдаётся через точку входа ASGI."""
+        start, body = self.call(None, {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('about:author'),
+            'headers': [(b'host', b'testserver')],
+        })
+        self.assertEqual(start['status'], 200)
+        self.assertIn('Об авторе'.encode(), body['body'])
+
+    @override_settings(POST_IMAGE_MAX_BYTES=4, DATA_UPLOAD_MAX_MEMORY_SIZE=2)
+    def test_large_body_is_rejected(self):
+        """Тело больше лимита отклоняется, не доходя до приложения."""
+        def application(environ, start_response):
+            raise AssertionError('Запрос не должен дойти до приложения')
+        scope = {'type': 'http', 'method': 'POST', 'path': '/'}
+        for headers, body in (
+            ([(b'content-length', b'100')], b''),
+            ([], b'0123456789'),
+        ):
+            with self.subTest(headers=headers):
+                start, _ = self.call(application, dict(
+                    scope, headers=headers
+                ), body=body)
+                self.assertEqual(start['status'], 413)
+
+
+class TemplatePrewarmTest(SimpleTestCase):
+    def test_project_templates_are_compiled_at_startup(self):
+        """Все шаблоны проекта попадают в кэш загрузчика при запуске."""
+        engine = engines['django'].engine
+        loader = engine.template_loaders[0]
+        loader.reset()
+        names = set(template_names(settings.TEMPLATES_DIR))
+        self.assertIn('includes/paginator.html', names)
+        self.assertEqual(prewarm(), len(names))
+        with override_settings(TEMPLATES_PREWARM=False):
+            self.assertEqual(prewarm(), 0)
+        self.assertTrue(names <= set(loader.get_template_cache))
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Blanc')
+        Post.objects.create(text='Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        request_metrics.reset()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    @override_settings(METRICS_SAMPLE_RATE=1, METRICS_TOKEN='secret')
+    def test_views_are_measured(self):
+        """/metrics отдаёт гистограммы по представлениям."""
+        # Чтение идёт на реплику, поэтому запросы собираются со всех баз
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(database))
+                for database in connections.all()
+            ]
+            self.client.get(reverse('posts:index'))
+        queries = sum(len(context) for context in captured)
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4; charset=utf-8')
+        view = 'view="posts:index"'
+        for name in ('yatube_request_duration_seconds',
+                     'yatube_db_duration_seconds',
+                     'yatube_template_duration_seconds'):
+            self.assertContains(response, f'{name}_count{{{view}}} 1')
+        self.assertContains(
+            response, f'yatube_db_queries_sum{{{view}}} {queries}'
+        )
+        self.assertContains(
+            response, f'yatube_db_queries_bucket{{{view},le="+Inf"}} 1'
+        )
+
+    def test_sampling_off_records_nothing(self):
+        """При нулевой доле замеров гистограммы пусты."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(request_metrics.render().count('_count{'), 0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """С заданным токеном /metrics требует его в заголовке."""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_closed_without_token(self):
+        """Пока METRICS_TOKEN не задан, /metrics закрыт для всех."""
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer '
+        )
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,16 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+@contextmanager
+def on_commit(using=DEFAULT_DB_ALIAS):
+    """Выполняет колбэки transaction.on_commit, отложенные в блоке.
+
+    TestCase не фиксирует транзакцию теста, и Django 2.2 их не вызывает;
+    то же делает captureOnCommitCallbacks(execute=True) из Django 3.2.
+    """
+    start = len(connections[using].run_on_commit)
+    yield
+    for _, callback in connections[using].run_on_commit[start:]:
+        callback()
@@ -0,0 +1,375 @@
+"""Миниатюры картинок постов создаются в фоне, а не в запросе.
+
+Для каждой картинки создаются варианты нескольких ширин в каждом формате
+из ``POST_IMAGE_FORMATS``; лента выводит их разметкой ``<picture>``.
+Готовые миниатюры берутся из KV-хранилища sorl, а если их ещё нет,
+генерация ставится в очередь пула процессов, и до её завершения
+страница показывает исходную картинку. Перед генерацией воркер
+пережимает сам оригинал, ограничивая разрешение и удаляя метаданные.
+"""
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+from PIL import Image, ImageOps
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import cache as feed_cache
+from . import workers
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+# Сколько секунд картинка считается стоящей в очереди: за это время
+# воркер успевает её обработать, а потерянное задание поставится снова
+PENDING_TIMEOUT = 10 * 60
+
+
+class Variant(namedtuple('Variant', 'format width height')):
+    @property
+    def geometry(self):
+        return f'{self.width}x{self.height}'
+
+    @property
+    def options(self):
+        return {'crop': 'center', 'upscale': True, 'format': self.format}
+
+
+def encodable(format_):
+    """Может ли sorl с установленным Pillow сохранить картинку в формате."""
+    Image.init()
+    return format_ in EXTENSIONS and format_ in Image.SAVE
+
+
+def variants():
+    """Все варианты миниатюры картинки поста."""
+    width, height = settings.POST_IMAGE_SIZE
+    return [
+        Variant(format_, size, round(height * size / width))
+        for format_ in settings.POST_IMAGE_FORMATS if encodable(format_)
+        for size in settings.POST_IMAGE_WIDTHS
+    ]
+
+
+class Picture:
+    """Варианты картинки поста для разметки ``<picture>``.
+
+    Последний из форматов идёт в ``<img>``, остальные — в ``<source>``.
+    Пока вариантов нет, ``<img>`` показывает исходную картинку.
+    """
+
+    def __init__(self, image, found):
+        width = settings.POST_IMAGE_SIZE[0]
+        self.sizes = f'(max-width: {width}px) 100vw, {width}px'
+        # Форматы в порядке предпочтения: (MIME-тип, [(ширина, файл)])
+        self.formats = []
+        for format_ in dict.fromkeys(variant.format for variant in found):
+            self.formats.append((Image.MIME.get(format_, ''), sorted(
+                (variant.width, thumbnail)
+                for variant, thumbnail in found.items()
+                if variant.format == format_
+            )))
+        self.sources = [
+            {'type': mime, 'srcset': self._srcset(files)}
+            for mime, files in self.formats[:-1]
+        ]
+        self.fallback = ImageFile(image)
+        self.srcset = ''
+        if self.formats:
+            _, files = self.formats[-1]
+            self.srcset = self._srcset(files)
+            self.fallback = next(
+                (thumbnail for size, thumbnail in files if size >= width),
+                files[-1][1],
+            )
+
+    @staticmethod
+    def _srcset(files):
+        return ', '.join(
+            f'{thumbnail.url} {size}w' for size, thumbnail in files
+        )
+
+
+class QueuedThumbnailBackend(ThumbnailBackend):
+    def thumbnail_name(self, source, geometry_string, options):
+        """Имя файла миниатюры с теми же опциями, что у sorl."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return self._get_thumbnail_filename(source, geometry_string, options)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        found = resolve([file_], [(geometry_string, options)])
+        return found.get((source.name, 0)) or source
+
+    def generate(self, file_, geometry_string, **options):
+        """Создаёт миниатюру; вызывается только в фоновом воркере."""
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+def resolve(files, geometries):
+    """Готовые миниатюры картинок: один запрос в кэш и не больше одного
+    в базу на весь набор. Картинки без миниатюр ставятся в очередь.
+
+    ``geometries`` — список пар (геометрия, опции sorl). Возвращает
+    словарь «(имя исходной картинки, номер пары) → миниатюра».
+    """
+    backend = default.backend
+    names = {}
+    for file_ in files:
+        source = ImageFile(file_)
+        for number, (geometry, options) in enumerate(geometries):
+            thumbnail = ImageFile(
+                backend.thumbnail_name(source, geometry, options),
+                default.storage,
+            )
+            names[add_prefix(thumbnail.key)] = (source.name, number)
+    if not names:
+        return {}
+
+    kv_cache = default.kvstore.cache
+    # Промахи не кэшируются: миниатюру создаёт другой процесс, и
+    # закэшированное отсутствие в локальном кэше пережило бы её появление.
+    values = {
+        key: value for key, value in kv_cache.get_many(list(names)).items()
+        if isinstance(value, str)
+    }
+    missing = set(names) - set(values)
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        kv_cache.set_many(stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(stored)
+
+    found = {}
+    incomplete = set()
+    for key, name in names.items():
+        if key in values:
+            found[name] = deserialize_image_file(values[key])
+        else:
+            incomplete.add(name[0])
+    # Без пула картинка обрабатывается сразу при сохранении поста, и
+    # запрос не должен делать эту работу сам
+    if settings.THUMBNAIL_WORKERS:
+        for name in incomplete:
+            enqueue(name)
+    return found
+
+
+def with_thumbnails(posts):
+    """Проставляет постам ``post.picture`` одним обращением к хранилищу.
+
+    ``post.thumbnail`` — картинка для ``<img>``: основной вариант или,
+    пока он не готов, оригинал.
+    """
+    all_variants = variants()
+    found = resolve(
+        [post.image for post in posts if post.image],
+        [(variant.geometry, variant.options) for variant in all_variants],
+    )
+    for post in posts:
+        if not post.image:
+            post.picture = post.thumbnail = None
+            continue
+        post.picture = Picture(post.image, {
+            variant: found[post.image.name, number]
+            for number, variant in enumerate(all_variants)
+            if (post.image.name, number) in found
+        })
+        post.thumbnail = post.picture.fallback
+    return posts
+
+
+def attach(page):
+    """Миниатюры для постов страницы ленты.
+
+    Посты страницы выбираются только при первом обращении к ним, так что
+    закэшированный фрагмент шаблона по-прежнему обходится без базы.
+    """
+    posts = page.object_list
+    page.object_list = SimpleLazyObject(
+        lambda: with_thumbnails(list(posts))
+    )
+    return page
+
+
+def generate(name):
+    """Создаёт все варианты миниатюры картинки."""
+    for variant in variants():
+        try:
+            default.backend.generate(name, variant.geometry, **variant.options)
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s', name)
+    refresh_pages(name)
+
+
+def refresh_pages(name):
+    """Сбрасывает кэш страниц с постами, у которых эта картинка.
+
+    Иначе закэшированные фрагменты и страницы, а с ними и ETag, ещё
+    долго показывали бы оригинал. Вызывается в процессе воркера, так что
+    до веб-процессов поколения доходят только через общий кэш.
+    """
+    from .signals import post_scopes
+    posts = Post.objects.filter(image=name).select_related('author', 'group')
+    for post in posts:
+        feed_cache.bump(*post_scopes(post))
+
+
+def _replace(name, content):
+    """Подменяет содержимое файла, не меняя имени, а значит и URL."""
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        default_storage.delete(name)
+        default_storage.save(name, ContentFile(content))
+        return
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path), delete=False
+    ) as temp:
+        temp.write(content)
+    os.replace(temp.name, path)
+
+
+# Поля ``info``, которые описывают само кодирование и которые Pillow
+# выставляет и при собственном сохранении; прочее — EXIF, XMP,
+# комментарии, текстовые блоки PNG — считается метаданными
+ENCODING_INFO = frozenset({
+    'jfif', 'jfif_version', 'jfif_unit', 'jfif_density', 'dpi',
+    'progressive', 'progression', 'adobe', 'adobe_transform',
+    'version', 'background', 'transparency', 'duration', 'loop',
+    'gamma', 'aspect', 'interlace', 'icc_profile',
+})
+
+
+def normalize(name):
+    """Пережимает оригинал картинки: большая сторона не длиннее
+    ``POST_IMAGE_MAX_SIDE``, метаданные вроде EXIF удалены.
+
+    Не трогает анимации и картинки, которые уже не больше предела и не
+    несут метаданных: повторный запуск не пережимает их заново.
+    """
+    limit = settings.POST_IMAGE_MAX_SIDE
+    with default_storage.open(name) as source:
+        image = Image.open(source)
+        if getattr(image, 'is_animated', False) or (
+            max(image.size) <= limit and set(image.info) <= ENCODING_INFO
+        ):
+            return
+        format_ = image.format
+        # thumbnail() декодирует JPEG сразу в уменьшенном масштабе
+        image.thumbnail((limit, limit))
+        image = ImageOps.exif_transpose(image)
+    # exif_transpose возвращает EXIF в info, а writer PNG сохраняет
+    # оттуда и его, и текстовые блоки
+    image.info = {
+        key: value for key, value in image.info.items()
+        if key in ENCODING_INFO
+    }
+    buffer = BytesIO()
+    image.save(
+        buffer, format=format_, quality=90,
+        icc_profile=image.info.get('icc_profile'),
+    )
+    _replace(name, buffer.getvalue())
+
+
+def prepare(name):
+    """Задание воркера: пережать оригинал и создать миниатюры."""
+    try:
+        try:
+            normalize(name)
+        except Exception:
+            logger.exception('Не удалось пережать картинку %s', name)
+        generate(name)
+    finally:
+        cache.delete(pending_key(name))
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = workers.pool(settings.THUMBNAIL_WORKERS)
+    return _executor
+
+
+def discard_executor():
+    """Бросает сломанный пул; следующий get_executor создаст новый."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def enqueue(name):
+    """Ставит обработку картинки в очередь после фиксации транзакции."""
+    if not name:
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: prepare(name))
+        return
+    transaction.on_commit(lambda: submit(name))
+
+
+def pending_key(name):
+    return f'thumb-pending:{name}'
+
+
+def submit(name):
+    """Отдаёт картинку пулу, если она ещё не ждёт в очереди.
+
+    Вызывается после фиксации транзакции внутри запроса, поэтому ошибки
+    пула только пишутся в журнал и не доходят до страницы.
+    """
+    # Каждая страница с картинкой без миниатюр снова просит её создать;
+    # общий ключ в кэше пропускает эти просьбы, пока задание в очереди
+    if not cache.add(pending_key(name), True, PENDING_TIMEOUT):
+        return
+    try:
+        try:
+            future = get_executor().submit(prepare, name)
+        except BrokenProcessPool:
+            # Процесс пула погиб, например от нехватки памяти на большой
+            # картинке, и сломанный пул уже не примет ни одного задания
+            logger.exception('Пул миниатюр сломан, создаётся новый')
+            discard_executor()
+            future = get_executor().submit(prepare, name)
+    except Exception:
+        logger.exception('Не удалось поставить в очередь картинку %s', name)
+        cache.delete(pending_key(name))
+        return
+
+    def done(future):
+        # Задание, погибшее вместе с процессом пула, не дошло до finally
+        # в prepare; без ключа его можно будет поставить снова
+        if future.cancelled() or future.exception() is not None:
+            cache.delete(pending_key(name))
+
+    future.add_done_callback(done)
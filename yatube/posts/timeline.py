@@ -0,0 +1,119 @@
+"""Лента подписок, материализованная при записи (fan-out on write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+страница подписок читается одним диапазоном по индексу (user, pub_date).
+Посты авторов с огромным числом подписчиков не раскладываются, а
+подмешиваются при чтении. Когда автор опускается до лимита, его
+последние посты раскладываются подписчикам задним числом (catch_up):
+иначе посты, пропущенные, пока он был над лимитом, пропали бы из лент.
+"""
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+
+def followers_count(author_id):
+    return AuthorStats.objects.filter(
+        author_id=author_id
+    ).values_list('followers_count', flat=True).first() or 0
+
+
+def is_celebrity(author_id):
+    return followers_count(author_id) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids.iterator()
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def recent_posts(author_id):
+    return list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT])
+
+
+def backfill(user_id, author_id):
+    """Переносит последние посты автора в ленту нового подписчика."""
+    if is_celebrity(author_id):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in recent_posts(author_id)
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def catch_up(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Нужна, когда автор опустился до TIMELINE_FANOUT_LIMIT: пока он был
+    над лимитом, fan_out и backfill его пропускали, а feed_for
+    больше не подмешивает его посты при чтении.
+    """
+    posts = recent_posts(author_id)
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for user_id in follower_ids.iterator()
+            for post_id, pub_date in posts
+        ),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+def unfollowed(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося читателя.
+
+    Если с этой отпиской автор опустился до лимита, его посты
+    раскладываются оставшимся подписчикам.
+    """
+    trim(user_id, author_id)
+    if followers_count(author_id) == settings.TIMELINE_FANOUT_LIMIT:
+        catch_up(author_id)
+
+
+def trim(user_id, author_id):
+    """Убирает посты автора из ленты отписавшегося читателя."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def feed_for(user):
+    """Посты ленты подписок пользователя для пагинации."""
+    celebrity_ids = list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+    if not celebrity_ids:
+        return Post.objects.feed().filter(
+            timeline_entries__user=user
+        ).order_by(
+            '-timeline_entries__pub_date',
+            F('timeline_entries__post').desc(),
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.feed().filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrity_ids)
+    )
@@ -0,0 +1,42 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class OversizedUploadedFile(UploadedFile):
+    """Файл, загрузка которого прервана на превышении лимита.
+
+    Содержимого нет, ``size`` — сколько байт успело прийти.
+    """
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    """Перестаёт принимать файл, как только тот превысил
+    ``POST_IMAGE_MAX_BYTES``, не дожидаясь конца загрузки.
+
+    Стоит первым в ``FILE_UPLOAD_HANDLERS``: до превышения отдаёт куски
+    следующим обработчикам (память или временный файл на диске),
+    после — отбрасывает их, а форма получает ``OversizedUploadedFile``.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return OversizedUploadedFile(
+                self.file_name, self.content_type, self.received
+            )
+        return None
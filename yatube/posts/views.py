@@ -1,34 +1,45 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 
-from yatube.settings import AMOUNT_POSTS_NUMBER
-
+from . import cache as feed_cache
+from . import counts
+from . import search as post_search
+from . import thumbnails, timeline
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import AuthorStats, Group, Post, User, Follow
+from .paginator import CursorPaginator, paginate
 
 
+@feed_cache.cache_anonymous_page('index')
+@feed_cache.conditional_page('index')
 def index(request):
     title = "Последние обновления на сайте"
-    posts = Post.objects.order_by("-pub_date")
-    paginator = Paginator(posts, AMOUNT_POSTS_NUMBER)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.feed()
+    page_obj = thumbnails.attach(
+        paginate(request, posts, count=counts.index_count)
+    )
     context = {
         "title": title,
         "page_obj": page_obj,
         "posts": posts,
+        "feed_generation": feed_cache.generation('index'),
+        "feed_cache_timeout": settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, "posts/index.html", context)
 
 
+@feed_cache.cache_anonymous_page('group:{slug}')
+@feed_cache.conditional_page('group:{slug}')
 def group_posts(request, slug):
     title = 'Записи сообщества'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.order_by("-pub_date")
-    paginator = Paginator(posts, AMOUNT_POSTS_NUMBER)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.feed()
+    page_obj = thumbnails.attach(paginate(request, posts))
     context = {
         "title": title,
         "page_obj": page_obj,
@@ -38,18 +49,20 @@ def group_posts(request, slug):
     return render(request, "posts/group_list.html", context)
 
 
+@feed_cache.cache_anonymous_page('profile:{username}')
+@feed_cache.conditional_page('profile:{username}')
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     following = request.user.is_authenticated and author.following.filter(
         user=request.user
     ).exists()
 
-    post_list = author.posts.order_by("-pub_date")
+    post_list = author.posts.feed()
 
-    paginator = Paginator(post_list, AMOUNT_POSTS_NUMBER)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    post_count = post_list.count()
+    post_count = AuthorStats.objects.for_author(author).posts_count
+    page_obj = thumbnails.attach(
+        paginate(request, post_list, count=lambda posts: post_count)
+    )
 
     context = {
         "author": author,
@@ -61,10 +74,43 @@ def profile(request, username):
     return render(request, "posts/profile.html", context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    results = post_search.get_backend().search(query) if query else []
+    paginator = Paginator(results, settings.AMOUNT_POSTS_NUMBER)
+    page_obj = thumbnails.attach(paginator.get_page(request.GET.get('page')))
+    context = {
+        'title': 'Поиск',
+        'query': query,
+        'page_obj': page_obj,
+        'page_prefix': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def post_author_scope(request, post_id):
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    return f'author:{author_id}'
+
+
+@feed_cache.conditional_page(
+    'post:{post_id}', post_author_scope, csrf=True
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = post.author.posts.count()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    post_count = AuthorStats.objects.for_author(post.author).posts_count
+    cursor = request.GET.get('cursor')
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        ordering=('created', 'pk'),
+    )
+    # Страница выбирается, только если блок комментариев не в кэше
+    comments = SimpleLazyObject(lambda: paginator.get_page(cursor))
 
     form = CommentForm(request.POST or None)
     context = {
@@ -72,6 +118,9 @@ def post_detail(request, post_id):
         "post_count": post_count,
         'form': form,
         'comments': comments,
+        'comments_cursor': cursor,
+        'comments_generation': feed_cache.generation(f'post:{post.pk}'),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
     }
     return render(request, "posts/post_detail.html", context)
 
@@ -85,7 +134,8 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
 
         return redirect("posts:profile", username=post.author.username)
     return render(request, "posts/create_post.html", {"form": form})
@@ -119,17 +169,23 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@feed_cache.conditional_page(
+    'index', lambda request: f'follows:{request.user.pk}'
+)
 def follow_index(request):
     title = 'Подписки'
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, AMOUNT_POSTS_NUMBER)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = timeline.feed_for(request.user)
+    page_obj = thumbnails.attach(paginate(
+        request, posts, count=lambda posts: counts.generation_count(
+            posts, 'index', f'follows:{request.user.pk}'
+        )
+    ))
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -140,16 +196,12 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if request.user != author and Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists() is False:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    Follow.objects.follow(request.user, author)
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    Follow.objects.unfollow(request.user, author)
     return redirect('posts:profile', username)
@@ -0,0 +1,25 @@
+"""Пул процессов для фоновой обработки картинок.
+
+Процессы пула запускаются через forkserver из чистого интерпретатора и
+не наследуют от веб-процесса соединения с базой, потоки и захваченные
+блокировки. Поэтому модуль не импортирует модели: процесс пула сначала
+настраивает Django и только потом получает задания.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+
+
+def setup():
+    django.setup(set_prefix=False)
+
+
+def pool(workers):
+    methods = multiprocessing.get_all_start_methods()
+    method = 'forkserver' if 'forkserver' in methods else 'spawn'
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context(method),
+        initializer=setup,
+    )
@@ -0,0 +1,12 @@
+import os
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+django.setup(set_prefix=False)
+
+from core.asgi import ASGIHandler  # noqa: E402
+from core.templates import prewarm  # noqa: E402
+
+application = ASGIHandler()
+prewarm()
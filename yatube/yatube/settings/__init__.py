@@ -0,0 +1,24 @@
+"""Настройки проекта.
+
+Профиль выбирается переменной окружения DJANGO_ENV:
+    prod — по умолчанию, без отладочных инструментов;
+    dev  — DEBUG и django-debug-toolbar для локальной разработки;
+    test — prod с Redis внутри процесса (fakeredis), включается manage.py test.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+DJANGO_ENV = os.getenv('DJANGO_ENV', 'prod')
+
+if DJANGO_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif DJANGO_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif DJANGO_ENV == 'test':
+    from .test import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(
+        f'Неизвестный профиль настроек DJANGO_ENV={DJANGO_ENV!r}, '
+        'ожидается dev, prod или test'
+    )
@@ -0,0 +1,308 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)
+)))
+
+SECRET_KEY = os.getenv('SECRET_KEY')
+
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+INSTALLED_APPS = [
+    "posts.apps.PostsConfig",
+    "users.apps.UsersConfig",
+    "core.apps.CoreConfig",
+    "about.apps.AboutConfig",
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+    "django.contrib.staticfiles",
+    "sorl.thumbnail",
+]
+
+MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "core.middleware.PrimaryDatabaseMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+ROOT_URLCONF = "yatube.urls"
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATES = [
+    {
+        # DjangoTemplates, замеряющий время отрисовки для /metrics
+        "BACKEND": "core.metrics.DjangoTemplates",
+        "NAME": "django",
+        "DIRS": [TEMPLATES_DIR],
+        "APP_DIRS": True,
+        "OPTIONS": {
+            "context_processors": [
+                "django.template.context_processors.debug",
+                "django.template.context_processors.request",
+                "django.contrib.auth.context_processors.auth",
+                "django.contrib.messages.context_processors.messages",
+                "core.context_processors.year.year",
+            ]
+        },
+    }
+]
+
+# Компилировать шаблоны из DIRS при запуске воркера, см. core.templates
+TEMPLATES_PREWARM = False
+
+WSGI_APPLICATION = "yatube.wsgi.application"
+# Точка входа ASGI — yatube.asgi.application. Представления выполняются
+# в пуле потоков, столько запросов процесс обслуживает одновременно
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 8))
+
+# База данных. DB_ENGINE выбирает движок:
+#   sqlite3    — файл db.sqlite3 (по умолчанию, для разработки);
+#   postgresql — общий PostgreSQL для нескольких серверов приложения,
+#                нужен пакет psycopg2-binary.
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    # DB_POOLER=pgbouncer: соединения идут через PgBouncer в режиме
+    # transaction, где серверные курсоры не живут дольше транзакции
+    DB_POOLER = os.getenv('DB_POOLER')
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'yatube'),
+            'USER': os.getenv('DB_USER', 'yatube'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Соединение переживает запрос и переиспользуется воркером
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'DISABLE_SERVER_SIDE_CURSORS': DB_POOLER == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+            'TEST': {
+                'NAME': os.getenv('DB_TEST_NAME'),
+            },
+        }
+    }
+    # Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2
+    for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1
+    ):
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+            # В тестах реплика — та же тестовая база
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv(
+                'DB_NAME', os.path.join(BASE_DIR, "db.sqlite3")
+            ),
+        }
+    }
+
+# Чтение безопасных запросов уходит на реплики, запись — в default
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи клиент читает только основную базу
+DB_STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', 5))
+
+# Доля запросов, которые MetricsMiddleware замеряет для /metrics: 0 — ни
+# одного, 1 — все. /metrics отдаётся только с заголовком
+# Authorization: Bearer <METRICS_TOKEN>; без токена он закрыт для всех
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Прагмы для каждого нового соединения с SQLite. В режиме WAL чтение
+# не ждёт записи, а запись — чтения; пустой словарь оставляет настройки
+# SQLite по умолчанию.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Отрицательное значение — размер в КиБ, а не в страницах
+    'cache_size': -int(os.getenv('SQLITE_CACHE_KIB', 64 * 1024)),
+    'temp_store': 'memory',
+}
+if os.getenv('SQLITE_TUNING', '1') == '0':
+    SQLITE_PRAGMAS = {}
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.MinimumLengthValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.CommonPasswordValidator",
+    },
+    {
+        "NAME": "django.contrib.auth.password_validation.NumericPasswordValidator",
+    },
+]
+
+LANGUAGE_CODE = "ru"
+
+TIME_ZONE = "UTC"
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+STATIC_URL = "/static/"
+
+STATICFILES_DIRS = (os.path.join(BASE_DIR, "static"),)
+
+
+LOGIN_URL = "users:login"
+LOGIN_REDIRECT_URL = "posts:index"
+# LOGOUT_REDIRECT_URL = 'posts:index'
+
+EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+AMOUNT_POSTS_NUMBER = 10
+# Комментарии под постом листаются курсором по столько штук
+COMMENTS_PER_PAGE = 50
+
+# Курсорная пагинация лент вместо номеров страниц
+CURSOR_PAGINATION = False
+# С какого числа строк по статистике базы (ANALYZE) пагинатор главной
+# ленты берёт оценку вместо точного COUNT(*), см. posts.counts
+FEED_COUNT_ESTIMATE_FROM = 10 ** 6
+
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписок при публикации, а подмешиваются при чтении. Когда
+# автор опускается до лимита, посты раскладываются задним числом; посты,
+# пропущенные до увеличения самого лимита, в ленты не попадут
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора переносится в ленту при подписке
+TIMELINE_BACKFILL_LIMIT = 500
+
+# Бэкенд поиска по постам; по умолчанию выбирается по движку базы
+POST_SEARCH_BACKEND = os.getenv('POST_SEARCH_BACKEND')
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+MEDIA_URL = '/media/'
+# Загрузка обрывается на превышении POST_IMAGE_MAX_BYTES, крупные файлы
+# до этого пишутся во временный файл, а не в память
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Миниатюры создаются в фоновом пуле процессов, в запросе их нет
+THUMBNAIL_BACKEND = 'posts.thumbnails.QueuedThumbnailBackend'
+# Картинка поста в ленте: размер, ширины вариантов для srcset и форматы
+# в порядке предпочтения; последний формат — запасной для <img>. Форматы,
+# которые не умеет сохранять установленный Pillow, пропускаются.
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = [360, 720, 960, 1440]
+POST_IMAGE_FORMATS = ['WEBP', 'JPEG']
+# Лимиты загружаемой картинки проверяются до её декодирования
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+# Оригинал пережимается в фоне до этой длины большей стороны
+POST_IMAGE_MAX_SIDE = 2560
+# 0 — создавать миниатюры в том же процессе после фиксации транзакции
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# Фрагменты ленты сбрасываются при изменении постов, таймаут лишь
+# ограничивает время жизни устаревших поколений
+FEED_CACHE_TIMEOUT = 60 * 60
+# Время жизни целиком закэшированных страниц для анонимных посетителей
+PAGE_CACHE_TIMEOUT = 60 * 10
+# Номера поколений живут дольше фрагментов и страниц, но не вечно:
+# имена областей берутся из URL, и запросы к несуществующим группам
+# и профилям иначе копили бы в кэше вечные ключи
+GENERATION_TIMEOUT = 60 * 60 * 24
+
+# Кэш, общий для всех воркеров. CACHE_BACKEND выбирает хранилище:
+#   locmem    — память процесса, только для dev: сброс поколений, счётчики
+#               и ETag не доходят до других воркеров;
+#   redis     — общий Redis, нужен пакет django-redis (по умолчанию в prod);
+#   fakeredis — Redis-протокол внутри процесса для тестов, пакет fakeredis;
+#   file      — файлы в CACHE_LOCATION;
+#   db        — таблица в базе, создаётся manage.py createcachetable.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
+
+
+def cache_settings(backend):
+    """Настройка CACHES для хранилища; профиль выбирает значение
+    CACHE_BACKEND по умолчанию."""
+    if backend in ('redis', 'fakeredis'):
+        config = {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+                # Недоступный Redis не должен ронять страницы: кэш
+                # пропускается
+                'IGNORE_EXCEPTIONS': True,
+            },
+        }
+        if backend == 'fakeredis':
+            import fakeredis
+
+            config['OPTIONS']['CONNECTION_POOL_KWARGS'] = {
+                'connection_class': fakeredis.FakeConnection,
+                'server': fakeredis.FakeServer(),
+            }
+    elif backend == 'file':
+        config = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION or os.path.join(BASE_DIR, 'cache'),
+        }
+    elif backend == 'db':
+        config = {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': CACHE_LOCATION or 'yatube_cache',
+        }
+    else:
+        config = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    return {
+        'default': {
+            **config,
+            'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube'),
+            # Смена версии при выкладке разом делает весь старый кэш
+            # невидимым
+            'VERSION': int(os.getenv('CACHE_VERSION', 1)),
+        }
+    }
+
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHES = cache_settings(CACHE_BACKEND)
@@ -0,0 +1,23 @@
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import cache_settings
+
+DEBUG = False
+
+# При DEBUG = False Django сам оборачивает загрузчики шаблонов в
+# cached.Loader; здесь остаётся только компиляция всех шаблонов сразу
+# при запуске воркера
+TEMPLATES_PREWARM = True
+
+# Поколения кэша, счётчики ленты и ETag должны быть общими для всех
+# воркеров, поэтому кэш в памяти процесса здесь не допускается
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis')
+if CACHE_BACKEND == 'locmem':
+    raise ImproperlyConfigured(
+        'CACHE_BACKEND=locmem не подходит для prod: каждый воркер увидит '
+        'свой кэш; укажите redis, file или db'
+    )
+CACHES = cache_settings(CACHE_BACKEND)
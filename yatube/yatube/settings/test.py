@@ -0,0 +1,9 @@
+import os
+
+from .prod import *  # noqa: F401,F403
+from .base import cache_settings
+
+# Настройки prod с Redis внутри процесса: тесты проверяют тот же путь
+# через django-redis, что и боевые воркеры, без внешнего сервера
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'fakeredis')
+CACHES = cache_settings(CACHE_BACKEND)